@@ -1,13 +1,52 @@
+import asyncio
 import httpx
 import os
 import json 
 import re
-OLLAMA_API_URL = "https://ollama.com/api/chat"
+import time
+from collections import deque
+
+from pydantic import ValidationError
+
+import metrics
+from schemas import MCQ
+OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "https://ollama.com/api/chat")
 OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY")
 MODEL_ID = "deepseek-v3.1:671b"
 
+# Connection pool
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "0") == "1"
+
+# Timeouts (seconds)
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "300"))
+LLM_TOTAL_TIMEOUT = float(os.getenv("LLM_TOTAL_TIMEOUT", "380"))
+
+# Stream questions into the buffer as they are parsed
+LLM_STREAM = os.getenv("LLM_STREAM", "1") == "1"
+
+# Questions per subject in one generation
+QUESTIONS_PER_CALL = 10
+
+# Latest latency per subject (time to first question vs full batch)
+GENERATION_STATS = {}
+
+# Token usage: recent calls and running totals
+TOKEN_USAGE = deque(maxlen=200)
+TOKEN_TOTALS = {"calls": 0, "prompt_tokens": 0, "response_tokens": 0}
 
-SYSTEM_PROMPT = """
+# Follow-up calls asking only for the questions that failed validation
+LLM_SHORTFALL_RETRIES = int(os.getenv("LLM_SHORTFALL_RETRIES", "1"))
+
+# Per subject: questions parsed / accepted / rejected per call
+YIELD_STATS = {}
+
+
+# ================= PROMPTS =================
+PROMPT_HEADER = """
 You are an expert examiner and analyst for the BEL Probationary Engineer
 (Computer Science) Computer Based Test (CBT).
 
@@ -23,86 +62,89 @@ EXAM CONTEXT (STRICT)
 • Style: Objective, factual, trap-based
 • No coding questions
 • No advanced numericals
+"""
 
-----------------------------------
-SUBJECT PRIORITY (VERY IMPORTANT)
-----------------------------------
-Focus HEAVILY on the following subjects and subtopics:
-
-1. Data Structures (HIGH WEIGHTAGE)
-   - Sorting (first pass / iteration output)
-   - Binary search (iterations count, best vs worst case)
-   - Heap (array representation, parent/child index)
-   - Hashing (linear probing, collision handling)
-   - Stack & Queue (operation sequence, overflow/underflow)
-
-2. Operating Systems
-   - Process states and transitions
-   - CPU scheduling (FCFS, convoy effect)
-   - Synchronization (critical section, mutual exclusion)
-   - Dispatcher latency and context switching
-   - Multithreading (user vs kernel threads, benefits)
-
-3. Computer Networks
-   - OSI model layers and their functions
-   - TCP vs UDP (reliability, connection, use-cases)
-   - Transmission modes (simplex, half-duplex, full-duplex)
-   - Common protocol functions (HTTP, FTP, DNS, ARP)
-   - Network topologies (bus, star, ring, mesh)
-
-4. DBMS
-   - Normalization and BCNF condition
-   - Keys and referential integrity
-   - Relational algebra (selection, projection, join)
-   - Triggers (basic behavior)
-   - DDL vs DML vs DCL
-
-5. Compiler Design
-   - Phases of compiler
-   - Lexical analysis (tokens, lexemes)
-   - Syntax analysis and parsing
-   - Context-Free Grammar (CFG)
-   - Chomsky hierarchy and derivations
-
-6. Digital Logic
-   - Binary number system and conversions
-   - Half adder vs full adder
-   - Adders and subtractors
-   - Multiplexers and demultiplexers
-   - Basic logic gate properties
-
-7. Object-Oriented Programming (OOPs)
-   - Encapsulation, inheritance, polymorphism, abstraction
-   - Interface vs abstract class (conceptual)
-   - Method overloading vs overriding
-   - Constructors and destructors
-   - static, final, virtual concepts (language-agnostic)
-
-8. Computer Architecture
-   - CPU components and instruction cycle
-   - RISC vs CISC
-   - Pipelining basics
-   - Memory hierarchy (cache vs main memory)
-   - Addressing modes (basic)
-
-9. Algorithms
-   - Time and space complexity (Big-O)
-   - Best, average, and worst case
-   - Searching vs sorting comparison
-   - Greedy vs divide-and-conquer (conceptual)
-
-10. Artificial Intelligence / Machine Learning (BASIC ONLY)
-   - AI vs ML vs DL
-   - Supervised vs unsupervised learning
-   - Common algorithms (linear regression, KNN, decision tree)
-   - Overfitting vs underfitting
-   - Basic evaluation terms (accuracy, precision)
-   - No mathematics, no neural network internals
+# Subjects in priority order with their subtopics
+SUBJECT_TOPICS = {
+    "Data Structures": [
+        "Sorting (first pass / iteration output)",
+        "Binary search (iterations count, best vs worst case)",
+        "Heap (array representation, parent/child index)",
+        "Hashing (linear probing, collision handling)",
+        "Stack & Queue (operation sequence, overflow/underflow)",
+    ],
+    "Operating Systems": [
+        "Process states and transitions",
+        "CPU scheduling (FCFS, convoy effect)",
+        "Synchronization (critical section, mutual exclusion)",
+        "Dispatcher latency and context switching",
+        "Multithreading (user vs kernel threads, benefits)",
+    ],
+    "Computer Networks": [
+        "OSI model layers and their functions",
+        "TCP vs UDP (reliability, connection, use-cases)",
+        "Transmission modes (simplex, half-duplex, full-duplex)",
+        "Common protocol functions (HTTP, FTP, DNS, ARP)",
+        "Network topologies (bus, star, ring, mesh)",
+    ],
+    "DBMS": [
+        "Normalization and BCNF condition",
+        "Keys and referential integrity",
+        "Relational algebra (selection, projection, join)",
+        "Triggers (basic behavior)",
+        "DDL vs DML vs DCL",
+    ],
+    "Compiler Design": [
+        "Phases of compiler",
+        "Lexical analysis (tokens, lexemes)",
+        "Syntax analysis and parsing",
+        "Context-Free Grammar (CFG)",
+        "Chomsky hierarchy and derivations",
+    ],
+    "Digital Logic": [
+        "Binary number system and conversions",
+        "Half adder vs full adder",
+        "Adders and subtractors",
+        "Multiplexers and demultiplexers",
+        "Basic logic gate properties",
+    ],
+    "Object-Oriented Programming (OOPs)": [
+        "Encapsulation, inheritance, polymorphism, abstraction",
+        "Interface vs abstract class (conceptual)",
+        "Method overloading vs overriding",
+        "Constructors and destructors",
+        "static, final, virtual concepts (language-agnostic)",
+    ],
+    "Computer Architecture": [
+        "CPU components and instruction cycle",
+        "RISC vs CISC",
+        "Pipelining basics",
+        "Memory hierarchy (cache vs main memory)",
+        "Addressing modes (basic)",
+    ],
+    "Algorithms": [
+        "Time and space complexity (Big-O)",
+        "Best, average, and worst case",
+        "Searching vs sorting comparison",
+        "Greedy vs divide-and-conquer (conceptual)",
+    ],
+    "Artificial Intelligence / Machine Learning (BASIC ONLY)": [
+        "AI vs ML vs DL",
+        "Supervised vs unsupervised learning",
+        "Common algorithms (linear regression, KNN, decision tree)",
+        "Overfitting vs underfitting",
+        "Basic evaluation terms (accuracy, precision)",
+        "No mathematics, no neural network internals",
+    ],
+}
+
+SUBJECTS = list(SUBJECT_TOPICS)
 
+PROMPT_RULES = """
 ----------------------------------
 OUTPUT RULES (STRICT)
 ----------------------------------
-1. Generate EXACTLY 10 MCQs at a time
+1. Generate EXACTLY the number of MCQs requested for each subject
 2. Each question must have:
    - Exactly 4 options
    - ONLY ONE correct answer
@@ -152,6 +194,87 @@ Prefer clarity over trickiness.
 Prioritize standard textbook facts.
 """
 
+
+def subject_block(subject: str) -> str:
+    topics = SUBJECT_TOPICS.get(subject)
+    if topics is None:
+        return f"{subject}\n"
+
+    heading = f"{subject} (HIGH WEIGHTAGE)" if subject == SUBJECTS[0] else subject
+    return heading + "\n" + "".join(f"   - {topic}\n" for topic in topics)
+
+
+def build_system_prompt(subjects: list) -> str:
+    """
+    Shared header and rules plus only the requested subjects' subtopics.
+    """
+    blocks = "\n".join(
+        f"{i}. {subject_block(subject)}" for i, subject in enumerate(subjects, start=1)
+    )
+    return (
+        PROMPT_HEADER
+        + "\n----------------------------------\n"
+        + "SUBJECT FOCUS\n"
+        + "----------------------------------\n"
+        + "Generate questions ONLY from the following subject(s) and subtopics:\n\n"
+        + blocks
+        + PROMPT_RULES
+    )
+
+
+# Full prompt with every subject (kept for reference / tooling)
+SYSTEM_PROMPT = build_system_prompt(SUBJECTS)
+
+
+# ================= SHARED CLIENT =================
+_client = None
+
+
+def start_client():
+    """
+    Creates the shared keep-alive client (owned by the app lifespan).
+    """
+    global _client
+
+    if _client is None:
+        http2 = LLM_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("⚠️ LLM_HTTP2 needs the h2 package, falling back to HTTP/1.1")
+                http2 = False
+
+        _client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=LLM_CONNECT_TIMEOUT,
+                read=LLM_READ_TIMEOUT,
+                write=LLM_CONNECT_TIMEOUT,
+                pool=LLM_CONNECT_TIMEOUT
+            ),
+            headers={
+                "Authorization": f"Bearer {OLLAMA_API_KEY}",
+                "Content-Type": "application/json"
+            }
+        )
+
+    return _client
+
+
+async def close_client():
+    global _client
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
 # ================= HELPER =================
 def extract_json(text: str) -> str:
     """
@@ -168,67 +291,428 @@ def extract_json(text: str) -> str:
     return text.strip()
 
 
-# ================= MAIN FUNCTION =================
-async def generate_mcqs(subject: str) -> list:
+def record_generation(subject: str, first_question_s, full_batch_s: float, count: int):
+    stats = GENERATION_STATS.setdefault(subject, {"calls": 0})
+    stats["calls"] += 1
+    stats["first_question_s"] = round(first_question_s, 3) if first_question_s is not None else None
+    stats["full_batch_s"] = round(full_batch_s, 3)
+    stats["questions"] = count
+
+    if first_question_s is not None:
+        print(
+            f"⏱️ {subject}: first question {first_question_s:.1f}s, "
+            f"full batch {full_batch_s:.1f}s ({count} questions)"
+        )
+
+
+def _yield_counts(subject: str) -> dict:
+    return YIELD_STATS.setdefault(subject, {
+        "calls": 0, "parsed": 0, "accepted": 0, "rejected": 0, "malformed": 0
+    })
+
+
+def validate_questions(subject: str, items: list, malformed: int = 0) -> list:
     """
-    Generates 10 MCQs and RETURNS A LIST (not raw JSON string)
-    Required for backend buffering.
+    Keeps the items that pass the MCQ schema and records the yield.
+    Rejected items are logged and dropped, never the whole batch.
     """
+    stats = _yield_counts(subject)
+    stats["parsed"] += len(items)
+    stats["malformed"] += malformed
+
+    valid = []
+    for item in items:
+        if not isinstance(item, dict):
+            stats["rejected"] += 1
+            continue
+        try:
+            question = MCQ.model_validate({"difficulty": "Moderate", **item, "subject": subject})
+        except ValidationError as exc:
+            stats["rejected"] += 1
+            print(f"⚠️ Rejected MCQ for {subject}: {exc.errors()[0]['loc']} {exc.errors()[0]['msg']}")
+            continue
+        valid.append(question.model_dump())
+
+    stats["accepted"] += len(valid)
+    metrics.MCQ_VALIDATION.inc("accepted", amount=len(valid))
+    metrics.MCQ_VALIDATION.inc("rejected", amount=len(items) - len(valid))
+    metrics.MCQ_VALIDATION.inc("malformed", amount=malformed)
+    return valid
+
+
+def yield_stats() -> dict:
+    return {
+        subject: {
+            **counts,
+            "yield": round(counts["accepted"] / (counts["parsed"] + counts["malformed"]), 3)
+            if counts["parsed"] + counts["malformed"] else 0.0
+        }
+        for subject, counts in YIELD_STATS.items()
+    }
+
 
-    payload = {
+def record_usage(subjects: list, data: dict, prompt_chars: int):
+    """
+    Records prompt/response token counts of one call
+    (Ollama prompt_eval_count/eval_count or OpenAI-style usage).
+    """
+    usage = data.get("usage") or {}
+    prompt_tokens = data.get("prompt_eval_count", usage.get("prompt_tokens"))
+    response_tokens = data.get("eval_count", usage.get("completion_tokens"))
+
+    TOKEN_USAGE.append({
+        "at": time.time(),
+        "subjects": subjects,
+        "prompt_chars": prompt_chars,
+        "prompt_tokens": prompt_tokens,
+        "response_tokens": response_tokens
+    })
+    TOKEN_TOTALS["calls"] += 1
+    TOKEN_TOTALS["prompt_tokens"] += prompt_tokens or 0
+    TOKEN_TOTALS["response_tokens"] += response_tokens or 0
+    metrics.LLM_TOKENS.inc("prompt", amount=prompt_tokens or 0)
+    metrics.LLM_TOKENS.inc("response", amount=response_tokens or 0)
+
+
+def build_payload(subjects: list, stream: bool, per_subject: int = QUESTIONS_PER_CALL) -> dict:
+    if len(subjects) == 1:
+        request = (
+            f"Generate exactly {per_subject} MCQs from the subject '{subjects[0]}'. "
+        )
+    else:
+        names = ", ".join(f"'{subject}'" for subject in subjects)
+        request = (
+            f"Generate exactly {per_subject} MCQs for EACH of these subjects: {names}. "
+            f"Set the \"subject\" field of every question to its subject name exactly as written. "
+        )
+
+    return {
         "model": MODEL_ID,
         "messages": [
             {
                 "role": "system",
-                "content": SYSTEM_PROMPT
+                "content": build_system_prompt(subjects)
             },
             {
                 "role": "user",
                 "content": (
-                    f"Generate exactly 10 MCQs from the subject '{subject}'. "
-                    f"Follow the JSON format strictly. "
-                    f"Do not add any extra text."
+                    request
+                    + "Follow the JSON format strictly. "
+                    + "Do not add any extra text."
                 )
             }
         ],
-        "stream": False
+        "stream": stream
     }
 
-    headers = {
-        "Authorization": f"Bearer {OLLAMA_API_KEY}",
-        "Content-Type": "application/json"
-    }
 
-    async with httpx.AsyncClient(timeout=380) as client:
-        response = await client.post(
-            OLLAMA_API_URL,
-            json=payload,
-            headers=headers
-        )
-        response.raise_for_status()
-        data = response.json()
+def prompt_size(payload: dict) -> int:
+    return sum(len(message["content"]) for message in payload["messages"])
+
+
+# ================= STREAMING PARSER =================
+def loads_lenient(text: str):
+    """
+    json.loads that also accepts trailing commas; None if still invalid.
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    try:
+        return json.loads(re.sub(r",\s*([}\]])", r"\1", text))
+    except ValueError:
+        return None
+
 
-    # ================= EXTRACT CONTENT (OLLAMA VARIANTS) =================
+def salvage_questions(text: str):
+    """
+    Returns (question dicts, malformed count) from a full response.
+    A clean document is parsed in one go; otherwise every well-formed
+    question object is pulled out of the broken one.
+    """
+    parsed = loads_lenient(extract_json(text))
+    if isinstance(parsed, dict) and isinstance(parsed.get("questions"), list):
+        return parsed["questions"], 0
+
+    parser = QuestionStreamParser()
+    items = parser.feed(text)
+    return items, parser.malformed
+
+
+class QuestionStreamParser:
+    """
+    Pulls complete question objects out of a {"questions": [...]}
+    document while it is still being generated.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = None
+        self.malformed = 0
+
+    def feed(self, chunk: str) -> list:
+        self._text += chunk
+        found = []
+
+        if not self._in_array:
+            match = re.search(r'"questions"\s*:\s*\[', self._text)
+            if not match:
+                return found
+            self._in_array = True
+            self._pos = match.end()
+
+        text = self._text
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    item = loads_lenient(text[self._start:i + 1])
+                    if item is None:
+                        self.malformed += 1
+                    else:
+                        found.append(item)
+                    self._start = None
+
+            i += 1
+
+        # Drop everything already consumed
+        keep = self._start if self._start is not None else i
+        self._text = text[keep:]
+        self._pos = i - keep
+        if self._start is not None:
+            self._start = 0
+
+        return found
+
+
+def stream_content(line: str):
+    """
+    Returns (text delta, chunk dict) of one streamed chunk
+    (Ollama NDJSON or OpenAI-style SSE).
+    The final chunk carries the token counts.
+    """
+    line = line.strip()
+    if line.startswith("data:"):
+        line = line[5:].strip()
+    if not line or line == "[DONE]":
+        return "", None
+
+    data = json.loads(line)
+    if "message" in data:
+        return data["message"].get("content", ""), data
+    if "choices" in data:
+        if not data["choices"]:
+            return "", data
+        return data["choices"][0].get("delta", {}).get("content") or "", data
+    return data.get("response", ""), data
+
+
+def response_text(data: dict) -> str:
     if "message" in data and "content" in data["message"]:
-        raw_text = data["message"]["content"]
-    elif "choices" in data:
-        raw_text = data["choices"][0]["message"]["content"]
-    elif "response" in data:
-        raw_text = data["response"]
-    else:
-        raise ValueError("Unable to extract LLM response")
+        return data["message"]["content"]
+    if "choices" in data:
+        return data["choices"][0]["message"]["content"]
+    if "response" in data:
+        return data["response"]
+    raise ValueError("Unable to extract LLM response")
 
-    # ================= CLEAN + PARSE JSON =================
-    cleaned = extract_json(raw_text)
 
-    parsed = json.loads(cleaned)
+# ================= MAIN FUNCTION =================
+async def _request(subjects: list, per_subject: int = QUESTIONS_PER_CALL):
+    """
+    One non-streaming call.
+    Returns (salvaged question dicts, malformed count).
+    """
+    payload = build_payload(subjects, stream=False, per_subject=per_subject)
+
+    started = time.perf_counter()
+    try:
+        # Connect/read limits come from the client; this caps the whole call
+        async with asyncio.timeout(LLM_TOTAL_TIMEOUT):
+            response = await start_client().post(OLLAMA_API_URL, json=payload)
+            response.raise_for_status()
+            data = response.json()
+    except Exception:
+        metrics.LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, "batch", "error")
+        raise
+    metrics.LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, "batch", "ok")
+
+    record_usage(subjects, data, prompt_size(payload))
+    for subject in subjects:
+        _yield_counts(subject)["calls"] += 1
+
+    return salvage_questions(response_text(data))
+
+
+async def _shortfall(subject: str, missing: int) -> list:
+    """
+    Asks again for only the questions that were rejected.
+    Best effort: a failed follow-up keeps what was already accepted.
+    """
+    valid = []
+    for _ in range(LLM_SHORTFALL_RETRIES):
+        if missing <= 0:
+            break
+        try:
+            items, malformed = await _request([subject], missing)
+        except Exception as exc:
+            print(f"⚠️ Shortfall request failed for {subject}:", exc)
+            break
+
+        accepted = validate_questions(subject, items, malformed)
+        valid.extend(accepted)
+        missing -= len(accepted)
+
+    return valid
+
 
-    # ================= FINAL VALIDATION =================
-    if (
-        not isinstance(parsed, dict)
-        or "questions" not in parsed
-        or not isinstance(parsed["questions"], list)
-    ):
-        raise ValueError("Invalid MCQ JSON structure")
+async def generate_mcqs(subject: str) -> list:
+    """
+    Generates 10 MCQs and RETURNS A LIST (not raw JSON string)
+    Required for backend buffering.
+    """
+    started = time.monotonic()
+    items, malformed = await _request([subject])
+    questions = validate_questions(subject, items, malformed)
+    questions += await _shortfall(subject, QUESTIONS_PER_CALL - len(questions))
+
+    if not questions:
+        raise ValueError(f"No valid MCQs generated for {subject}")
+
+    elapsed = time.monotonic() - started
+    record_generation(subject, elapsed, elapsed, len(questions))
+
+    return questions
+
+
+async def _batch_once(subjects: list, per_subject: int) -> dict:
+    items, malformed = await _request(subjects, per_subject)
+
+    by_name = {subject.lower(): subject for subject in subjects}
+    raw = {subject: [] for subject in subjects}
+    for item in items:
+        subject = None
+        if isinstance(item, dict):
+            subject = by_name.get(str(item.get("subject", "")).strip().lower())
+        if subject is None and len(subjects) == 1:
+            subject = subjects[0]
+        if subject is not None:
+            raw[subject].append(item)
+
+    # Unattributable malformed objects are charged to the first subject
+    return {
+        subject: validate_questions(subject, raw[subject], malformed if i == 0 else 0)
+        for i, subject in enumerate(subjects)
+    }
 
-    return parsed["questions"]
+
+async def generate_mcqs_batch(subjects: list, per_subject: int = QUESTIONS_PER_CALL) -> dict:
+    """
+    Generates questions for several subjects in ONE call.
+    Returns {subject: [questions]}; questions whose subject does not
+    match a requested one are dropped.
+    """
+    started = time.monotonic()
+    grouped = await _batch_once(subjects, per_subject)
+
+    # Short subjects are topped up together in one follow-up call
+    short = [subject for subject in subjects if len(grouped[subject]) < per_subject]
+    if len(short) == 1:
+        grouped[short[0]] += await _shortfall(short[0], per_subject - len(grouped[short[0]]))
+    elif short and LLM_SHORTFALL_RETRIES > 0:
+        missing = max(per_subject - len(grouped[subject]) for subject in short)
+        try:
+            extra = await _batch_once(short, missing)
+        except Exception as exc:
+            print("⚠️ Shortfall request failed for", ", ".join(short), exc)
+            extra = {}
+        for subject, questions in extra.items():
+            grouped[subject] += questions
+
+    elapsed = time.monotonic() - started
+    for subject, questions in grouped.items():
+        if questions:
+            record_generation(subject, elapsed, elapsed, len(questions))
+
+    return grouped
+
+
+async def generate_mcqs_stream(subject: str):
+    """
+    Streaming variant of generate_mcqs.
+    Yields each MCQ dict as soon as its JSON object is complete and valid.
+    """
+    payload = build_payload([subject], stream=True)
+    parser = QuestionStreamParser()
+    started = time.monotonic()
+    first_question_s = None
+    count = 0
+    last_chunk = {}
+
+    outcome = "error"
+    try:
+        async with asyncio.timeout(LLM_TOTAL_TIMEOUT):
+            async with start_client().stream("POST", OLLAMA_API_URL, json=payload) as response:
+                response.raise_for_status()
+
+                async for line in response.aiter_lines():
+                    content, chunk = stream_content(line)
+                    if chunk is not None:
+                        last_chunk = chunk
+                    if not content:
+                        continue
+
+                    malformed = parser.malformed
+                    items = parser.feed(content)
+                    for question in validate_questions(subject, items, parser.malformed - malformed):
+                        if first_question_s is None:
+                            first_question_s = time.monotonic() - started
+                        count += 1
+                        yield question
+        outcome = "ok"
+    finally:
+        metrics.LLM_REQUEST_SECONDS.observe(time.monotonic() - started, "stream", outcome)
+
+    record_usage([subject], last_chunk, prompt_size(payload))
+    _yield_counts(subject)["calls"] += 1
+
+    for question in await _shortfall(subject, QUESTIONS_PER_CALL - count):
+        if first_question_s is None:
+            first_question_s = time.monotonic() - started
+        count += 1
+        yield question
+
+    if count == 0:
+        raise ValueError(f"No valid MCQs generated for {subject}")
+
+    record_generation(subject, first_question_s, time.monotonic() - started, count)
+
+
+def usage_stats() -> dict:
+    return {
+        "totals": TOKEN_TOTALS,
+        "recent_calls": list(TOKEN_USAGE)[-20:]
+    }
@@ -0,0 +1,192 @@
+import json
+import time
+
+# Running aggregates kept next to the attempts, in the same database.
+# Each save updates a fixed number of rows (overall, its subject, its
+# difficulty) in the attempt's own transaction, so /stats reads a
+# handful of small rows no matter how long the history is.
+
+BUCKET_SECONDS = 3600
+# Hourly buckets older than this are dropped (bounds the 7-day window)
+BUCKET_RETENTION = 7 * 24
+WINDOWS = {"24h": 24, "7d": 7 * 24}
+
+# Accuracy over the most recent attempts
+RECENT_SIZE = 50
+
+DAY_SECONDS = 86400
+
+LAST_ID_SCOPE = "_last_attempt_id"
+
+
+def init(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analytics (
+            scope TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        )
+    """)
+
+
+def is_correct(result) -> bool:
+    return str(result or "").strip().lower() == "correct"
+
+
+def _empty() -> dict:
+    return {
+        "attempts": 0,
+        "correct": 0,
+        "streak": 0,
+        "best_streak": 0,
+        "day_streak": 0,
+        "best_day_streak": 0,
+        "last_day": None,
+        "last_at": None,
+        "recent": "",
+        "buckets": {},
+        "difficulty": {}
+    }
+
+
+def _scopes(subject, difficulty) -> list:
+    scopes = ["overall", f"subject:{subject or 'Unknown'}"]
+    if difficulty:
+        scopes.append(f"difficulty:{difficulty}")
+    return scopes
+
+
+def _update(agg: dict, created_at: float, difficulty, correct: bool):
+    agg["attempts"] += 1
+    agg["correct"] += correct
+
+    # Consecutive correct answers
+    agg["streak"] = agg["streak"] + 1 if correct else 0
+    agg["best_streak"] = max(agg["best_streak"], agg["streak"])
+
+    # Consecutive days with at least one attempt (UTC days)
+    day = int(created_at // DAY_SECONDS)
+    if agg["last_day"] is None or day > agg["last_day"] + 1:
+        agg["day_streak"] = 1
+    elif day == agg["last_day"] + 1:
+        agg["day_streak"] += 1
+    agg["best_day_streak"] = max(agg["best_day_streak"], agg["day_streak"])
+    agg["last_day"] = max(day, agg["last_day"] or day)
+    agg["last_at"] = created_at
+
+    agg["recent"] = (agg["recent"] + ("1" if correct else "0"))[-RECENT_SIZE:]
+
+    hour = int(created_at // BUCKET_SECONDS)
+    bucket = agg["buckets"].setdefault(str(hour), [0, 0])
+    bucket[0] += 1
+    bucket[1] += correct
+    for key in [key for key in agg["buckets"] if int(key) <= hour - BUCKET_RETENTION]:
+        del agg["buckets"][key]
+
+    if difficulty:
+        split = agg["difficulty"].setdefault(difficulty, [0, 0])
+        split[0] += 1
+        split[1] += correct
+
+
+def apply(conn, records: list):
+    """
+    Folds new attempts into the aggregates. Must run inside the
+    transaction that stored them (the write lock is already held).
+    records: [(attempt_id, created_at, subject, difficulty, result), ...]
+    Attempts at or below the recorded last id are skipped, so replays
+    are harmless.
+    """
+    last_id = last_applied_id(conn)
+    records = [record for record in records if record[0] > last_id]
+    if not records:
+        return
+
+    aggregates = {}
+    for attempt_id, created_at, subject, difficulty, result in records:
+        for scope in _scopes(subject, difficulty):
+            if scope not in aggregates:
+                stored = conn.execute(
+                    "SELECT data FROM analytics WHERE scope = ?", (scope,)
+                ).fetchone()
+                aggregates[scope] = json.loads(stored[0]) if stored else _empty()
+            _update(aggregates[scope], created_at, difficulty, is_correct(result))
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO analytics (scope, data) VALUES (?, ?)",
+        [(scope, json.dumps(agg)) for scope, agg in aggregates.items()]
+        + [(LAST_ID_SCOPE, str(max(record[0] for record in records)))]
+    )
+
+
+def last_applied_id(conn) -> int:
+    row = conn.execute(
+        "SELECT data FROM analytics WHERE scope = ?", (LAST_ID_SCOPE,)
+    ).fetchone()
+    return int(row[0]) if row else 0
+
+
+# ================= READ =================
+def _accuracy(attempts: int, correct: int):
+    return round(correct / attempts, 4) if attempts else None
+
+
+def summarize(agg: dict, now: float) -> dict:
+    hour = int(now // BUCKET_SECONDS)
+    windows = {}
+    for name, hours in WINDOWS.items():
+        attempts = correct = 0
+        for key, (count, right) in agg["buckets"].items():
+            if int(key) > hour - hours:
+                attempts += count
+                correct += right
+        windows[name] = {"attempts": attempts, "correct": correct, "accuracy": _accuracy(attempts, correct)}
+
+    # A day streak only counts while today or yesterday had attempts
+    today = int(now // DAY_SECONDS)
+    active = agg["last_day"] is not None and agg["last_day"] >= today - 1
+
+    summary = {
+        "attempts": agg["attempts"],
+        "correct": agg["correct"],
+        "accuracy": _accuracy(agg["attempts"], agg["correct"]),
+        "streak": agg["streak"],
+        "best_streak": agg["best_streak"],
+        "day_streak": agg["day_streak"] if active else 0,
+        "best_day_streak": agg["best_day_streak"],
+        "last_attempt_at": agg["last_at"],
+        f"last_{RECENT_SIZE}": {
+            "attempts": len(agg["recent"]),
+            "accuracy": _accuracy(len(agg["recent"]), agg["recent"].count("1"))
+        },
+        "windows": windows
+    }
+    if agg["difficulty"]:
+        summary["difficulty"] = {
+            difficulty: {"attempts": count, "correct": right, "accuracy": _accuracy(count, right)}
+            for difficulty, (count, right) in agg["difficulty"].items()
+        }
+    return summary
+
+
+def read(conn, now: float = None) -> dict:
+    """
+    All aggregates: one row per subject and difficulty plus overall.
+    """
+    now = time.time() if now is None else now
+    stats = {"overall": summarize(_empty(), now), "subjects": {}, "difficulties": {}}
+
+    for scope, data in conn.execute("SELECT scope, data FROM analytics").fetchall():
+        if scope == LAST_ID_SCOPE:
+            stats["last_attempt_id"] = int(data)
+            continue
+
+        summary = summarize(json.loads(data), now)
+        kind, _, name = scope.partition(":")
+        if kind == "overall":
+            stats["overall"] = summary
+        elif kind == "subject":
+            stats["subjects"][name] = summary
+        elif kind == "difficulty":
+            stats["difficulties"][name] = summary
+
+    return stats
@@ -1,33 +1,350 @@
 import asyncio
+import os
+import time
 
-# Buffer settings
-BUFFER_SIZE = 20
-LOW_WATER_MARK = 5
+import metrics
+import prefetch
+import storage
+from buffer_backends import make_backend
 
-# In-memory buffers per subject
-QUESTION_BUFFER = {}
+# Where buffered questions live (memory / sqlite / redis)
+BACKEND = make_backend()
 
-# One lock per subject
-BUFFER_LOCKS = {}
+# Waiters re-check a shared backend this often, since questions pushed
+# by other workers do not notify local conditions
+SHARED_POLL_INTERVAL = 0.25
+
+# One condition per subject, notified for every locally buffered question
+BUFFER_CONDITIONS = {}
+
+# At most one in-flight generation per subject (per worker; the backend
+# lease makes it one across workers)
+REFILL_TASKS = {}
+
+# Warm subjects that are also running low share one LLM call
+LLM_BATCH_MAX_SUBJECTS = int(os.getenv("LLM_BATCH_MAX_SUBJECTS", "3"))
+
+# Background warm-ups (startup, mock-test pools) share this many
+# concurrent generations between them
+WARM_CONCURRENCY = int(os.getenv("WARM_CONCURRENCY", "3"))
+_warm_slots = None
+
+# A generation that dedup drops entirely is retried this many times
+EMPTY_BATCH_RETRIES = int(os.getenv("EMPTY_BATCH_RETRIES", "2"))
+
+
+class NoQuestionsGenerated(ValueError):
+    pass
 
 
 def ensure_subject(subject: str):
-    if subject not in QUESTION_BUFFER:
-        QUESTION_BUFFER[subject] = []
-        BUFFER_LOCKS[subject] = asyncio.Lock()
+    if subject not in BUFFER_CONDITIONS:
+        BUFFER_CONDITIONS[subject] = asyncio.Condition()
+
+
+def _log_failure(task: asyncio.Task):
+    # Retrieving the exception also silences "never retrieved" warnings
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️ Refill failed for {task.get_name()}:", task.exception())
+
+
+async def _push(subject: str, question: dict):
+    condition = BUFFER_CONDITIONS[subject]
+
+    # Stored once with its content-hash id; attempts reference the id
+    await asyncio.to_thread(storage.save_generated, [question])
+    await BACKEND.push(subject, question)
+
+    async with condition:
+        condition.notify(1)
+
+
+async def depth(subject: str) -> int:
+    return await BACKEND.depth(subject)
+
+
+async def restore_buffers() -> list:
+    """
+    Reloads questions generated but not served before the last restart.
+    Returns them so other indexes can be seeded.
+    """
+    return await BACKEND.restore()
+
+
+async def _generate_once(subject: str, generate_fn) -> int:
+    result = generate_fn(subject)
+    count = 0
+
+    if hasattr(result, "__aiter__"):
+        # Streaming: each question is served the moment it is parsed
+        async for question in result:
+            await _push(subject, question)
+            count += 1
+    else:
+        questions = await result
+        if questions and isinstance(questions, list):
+            for question in questions:
+                await _push(subject, question)
+                count += 1
+
+    return count
+
+
+async def _generate_batch(subject: str, generate_fn) -> int:
+    started = time.monotonic()
+
+    # Every question may have been a near-duplicate: ask again, bounded
+    for _ in range(EMPTY_BATCH_RETRIES + 1):
+        count = await _generate_once(subject, generate_fn)
+        if count:
+            break
+        metrics.REFILLS.inc(subject, "empty")
+    else:
+        raise NoQuestionsGenerated(f"No new questions generated for {subject}")
+
+    prefetch.record_generation(subject, time.monotonic() - started)
+    return count
+
+
+async def _run_refill(subject: str, generate_fn, target: int = None):
+    condition = BUFFER_CONDITIONS[subject]
+    goal = max(target or 0, prefetch.high_water(subject))
+
+    # Another worker is already generating for this subject
+    if not await BACKEND.acquire_refill(subject):
+        metrics.REFILLS.inc(subject, "leased_elsewhere")
+        return
+
+    try:
+        if await BACKEND.depth(subject) >= goal:
+            return
 
+        # Fill up to the goal; cold subjects get one batch at most unless
+        # an explicit target (e.g. mock-test warming) asks for more
+        while True:
+            try:
+                await _generate_batch(subject, generate_fn)
+            except Exception:
+                metrics.REFILLS.inc(subject, "failed")
+                raise
+            metrics.REFILLS.inc(subject, "ok")
 
-async def refill_buffer(subject: str, generate_fn):
+            if await BACKEND.depth(subject) >= goal:
+                break
+            if target is None and prefetch.is_cold(subject):
+                break
+    finally:
+        await BACKEND.release_refill(subject)
+
+        # Let waiters see the outcome (success or failure)
+        async with condition:
+            condition.notify_all()
+
+
+async def _run_batch_refill(subjects: list, batch_fn):
+    leased = []
+    try:
+        for subject in subjects:
+            if await BACKEND.acquire_refill(subject):
+                leased.append(subject)
+
+        if not leased:
+            return
+
+        started = time.monotonic()
+        try:
+            grouped = await batch_fn(leased)
+        except Exception:
+            for subject in leased:
+                metrics.REFILLS.inc(subject, "failed")
+            raise
+        elapsed = time.monotonic() - started
+
+        for subject in leased:
+            questions = grouped.get(subject) or []
+            for question in questions:
+                await _push(subject, question)
+            if questions:
+                prefetch.record_generation(subject, elapsed)
+                metrics.REFILLS.inc(subject, "ok_batched")
+    finally:
+        for subject in leased:
+            await BACKEND.release_refill(subject)
+
+        for subject in subjects:
+            condition = BUFFER_CONDITIONS[subject]
+            async with condition:
+                condition.notify_all()
+
+
+def refill_batch(subjects: list, batch_fn) -> asyncio.Task:
     """
-    Background task to refill buffer
+    One generation for several subjects.
+    The task is registered for every subject, so single-flight holds.
+    Subjects it leaves short are topped up by the normal refill later.
+    """
+    for subject in subjects:
+        ensure_subject(subject)
+
+    task = asyncio.create_task(_run_batch_refill(subjects, batch_fn), name=", ".join(subjects))
+    task.add_done_callback(_log_failure)
+    for subject in subjects:
+        REFILL_TASKS[subject] = task
+
+    return task
+
+
+async def _batch_companions(subject: str) -> list:
+    """
+    Other warm subjects below their low watermark, with no refill running.
+    """
+    companions = []
+    for other in list(prefetch.DEMAND):
+        if len(companions) >= LLM_BATCH_MAX_SUBJECTS - 1:
+            break
+        if other == subject or refill_in_flight(other) or prefetch.is_cold(other):
+            continue
+        if prefetch.should_refill(other, await BACKEND.depth(other)):
+            companions.append(other)
+
+    return companions
+
+
+def refill_in_flight(subject: str) -> bool:
+    task = REFILL_TASKS.get(subject)
+    return task is not None and not task.done()
+
+
+def refill_buffer(subject: str, generate_fn, target: int = None) -> asyncio.Task:
+    """
+    Single-flight refill.
+    Returns the in-flight generation for the subject if there is one,
+    otherwise starts it. Safe to fire and forget or to await.
+    target raises the fill level above the prefetch high watermark.
     """
     ensure_subject(subject)
 
-    async with BUFFER_LOCKS[subject]:
-        if len(QUESTION_BUFFER[subject]) >= BUFFER_SIZE:
+    task = REFILL_TASKS.get(subject)
+    if task is None or task.done():
+        task = asyncio.create_task(_run_refill(subject, generate_fn, target), name=subject)
+        task.add_done_callback(_log_failure)
+        REFILL_TASKS[subject] = task
+
+    return task
+
+
+async def _warm_subject(subject: str, target, generate_fn, semaphore: asyncio.Semaphore):
+    goal = target or prefetch.high_water(subject)
+
+    # A few rounds: an in-flight refill may stop short of the goal
+    for _ in range(3):
+        if await BACKEND.depth(subject) >= goal:
+            return
+        async with semaphore:
+            try:
+                await refill_buffer(subject, generate_fn, target=target)
+            except Exception as e:
+                print(f"⚠️ Warm-up failed for {subject}:", e)
+                return
+        if target is None:
             return
 
-        questions = await generate_fn(subject)
 
-        if questions and isinstance(questions, list):
-            QUESTION_BUFFER[subject].extend(questions)
+async def warm(targets: dict, generate_fn):
+    """
+    Fills several subjects concurrently. Every warm-up draws on the same
+    WARM_CONCURRENCY slots, so overlapping warm-ups never add up.
+    targets: {subject: fill level, or None for the prefetch high watermark}
+    """
+    global _warm_slots
+
+    if _warm_slots is None:
+        _warm_slots = asyncio.Semaphore(max(1, WARM_CONCURRENCY))
+    await asyncio.gather(*(
+        _warm_subject(subject, target, generate_fn, _warm_slots)
+        for subject, target in targets.items()
+    ))
+
+
+async def take_ready(subject: str, n: int) -> list:
+    """
+    Pops up to n buffered questions without waiting or touching the
+    prefetch demand model (bulk consumers such as mock papers).
+    """
+    ensure_subject(subject)
+
+    questions = []
+    while len(questions) < n:
+        question = await BACKEND.pop(subject)
+        if question is None:
+            break
+        questions.append(question)
+
+    metrics.QUESTIONS_SERVED.inc(subject, "bulk", amount=len(questions))
+    return questions
+
+
+async def get_question(subject: str, generate_fn, batch_fn=None, wait: bool = True):
+    """
+    Pops the next question.
+    Starts a background refill when the prefetch controller asks for
+    one (batched with other low subjects when batch_fn is given). On an
+    empty buffer, waits on the shared in-flight refill and is woken per
+    question, so a burst of users costs one generation.
+    With wait=False an empty buffer returns None instead.
+    """
+    ensure_subject(subject)
+
+    current = await BACKEND.depth(subject)
+    # Demand is what is actually served: an empty wait=False poll is
+    # recorded only if it gets a question
+    if wait:
+        prefetch.record_serve(subject, current)
+    if not refill_in_flight(subject) and prefetch.should_refill(subject, current):
+        # A user waiting on an empty buffer gets the faster single-subject call
+        companions = await _batch_companions(subject) if batch_fn and current > 0 else []
+        if companions:
+            refill_batch([subject] + companions, batch_fn)
+        else:
+            refill_buffer(subject, generate_fn)
+
+    question = await BACKEND.pop(subject)
+    if question is not None:
+        if not wait:
+            prefetch.record_serve(subject, current)
+        metrics.QUESTIONS_SERVED.inc(subject, "buffer")
+        return question
+
+    if not wait:
+        return None
+
+    # Buffer miss: the user waits on the refill
+    with metrics.QUESTION_WAIT_SECONDS.time(subject):
+        question = await _wait_for_question(subject, generate_fn)
+    metrics.QUESTIONS_SERVED.inc(subject, "wait")
+    return question
+
+
+async def _wait_for_question(subject: str, generate_fn) -> dict:
+    condition = BUFFER_CONDITIONS[subject]
+
+    # Shared backends are polled: other workers' pushes do not notify us
+    poll = SHARED_POLL_INTERVAL if BACKEND.shared else None
+
+    async with condition:
+        while True:
+            question = await BACKEND.pop(subject)
+            if question is not None:
+                return question
+
+            task = refill_buffer(subject, generate_fn)
+            try:
+                await asyncio.wait_for(condition.wait(), poll)
+            except asyncio.TimeoutError:
+                pass
+
+            if task.done() and not task.cancelled() and task.exception():
+                question = await BACKEND.pop(subject)
+                if question is not None:
+                    return question
+                raise task.exception()
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import os
+import uuid
+from collections import deque
+
+import question_pool
+
+# memory: per-process deques (written through to the question pool)
+# sqlite: one pool shared by every worker on the host
+# redis:  any Redis-protocol server, for workers on several hosts
+BUFFER_BACKEND = os.getenv("BUFFER_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# A refill lease outlives one LLM call; it is renewed on every push
+REFILL_LEASE_TTL = float(os.getenv("REFILL_LEASE_TTL", "120"))
+
+# Identifies this worker when holding refill leases
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class MemoryBackend:
+    """
+    Per-process deques of (pool_id, question).
+    Single worker only: every process has its own buffers.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._buffers = {}
+
+    def _buffer(self, subject: str) -> deque:
+        if subject not in self._buffers:
+            self._buffers[subject] = deque()
+        return self._buffers[subject]
+
+    async def restore(self) -> list:
+        restored = []
+        for subject, items in (await asyncio.to_thread(question_pool.load_unserved)).items():
+            self._buffer(subject).extend(items)
+            restored.extend(question for _, question in items)
+        return restored
+
+    async def depth(self, subject: str) -> int:
+        return len(self._buffer(subject))
+
+    async def push(self, subject: str, question: dict):
+        pool_id = await asyncio.to_thread(question_pool.add, subject, question)
+        self._buffer(subject).append((pool_id, question))
+
+    async def pop(self, subject: str):
+        buffer = self._buffer(subject)
+        while buffer:
+            pool_id, question = buffer.popleft()
+
+            # Claim is committed before serving: never served twice
+            if await asyncio.to_thread(question_pool.claim, pool_id):
+                return question
+
+        return None
+
+    async def acquire_refill(self, subject: str) -> bool:
+        # The in-process single-flight task is enough
+        return True
+
+    async def release_refill(self, subject: str):
+        pass
+
+
+class SqliteBackend:
+    """
+    The question pool itself is the buffer, shared by all workers.
+    Pops are atomic claims; refills are guarded by a lease row.
+    Every call runs in a thread: another worker's write lock never
+    stalls this event loop.
+    """
+
+    shared = True
+
+    async def restore(self) -> list:
+        return [
+            question
+            for items in (await asyncio.to_thread(question_pool.load_unserved)).values()
+            for _, question in items
+        ]
+
+    async def depth(self, subject: str) -> int:
+        return await asyncio.to_thread(question_pool.count_unserved, subject)
+
+    async def push(self, subject: str, question: dict):
+        await asyncio.to_thread(question_pool.add, subject, question)
+        await asyncio.to_thread(question_pool.acquire_lease, subject, WORKER_ID, REFILL_LEASE_TTL)
+
+    async def pop(self, subject: str):
+        return await asyncio.to_thread(question_pool.claim_next, subject)
+
+    async def acquire_refill(self, subject: str) -> bool:
+        return await asyncio.to_thread(question_pool.acquire_lease, subject, WORKER_ID, REFILL_LEASE_TTL)
+
+    async def release_refill(self, subject: str):
+        await asyncio.to_thread(question_pool.release_lease, subject, WORKER_ID)
+
+
+class RedisBackend:
+    """
+    Lists in a Redis-protocol server (needs the optional `redis` package).
+    LPOP is atomic; refills are guarded by SET NX PX.
+    """
+
+    shared = True
+
+    # Deletes the lease only if this worker still owns it
+    RELEASE_SCRIPT = """
+    if redis.call("GET", KEYS[1]) == ARGV[1] then
+        return redis.call("DEL", KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("BUFFER_BACKEND=redis needs `pip install redis`")
+
+        self._redis = redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _key(subject: str) -> str:
+        return f"bel:buffer:{subject}"
+
+    @staticmethod
+    def _lease_key(subject: str) -> str:
+        return f"bel:refill:{subject}"
+
+    async def restore(self) -> list:
+        restored = []
+        async for key in self._redis.scan_iter("bel:buffer:*"):
+            restored.extend(json.loads(item) for item in await self._redis.lrange(key, 0, -1))
+        return restored
+
+    async def depth(self, subject: str) -> int:
+        return await self._redis.llen(self._key(subject))
+
+    async def push(self, subject: str, question: dict):
+        await self._redis.rpush(self._key(subject), json.dumps(question, ensure_ascii=False))
+        await self._redis.pexpire(self._lease_key(subject), int(REFILL_LEASE_TTL * 1000))
+
+    async def pop(self, subject: str):
+        item = await self._redis.lpop(self._key(subject))
+        return json.loads(item) if item is not None else None
+
+    async def acquire_refill(self, subject: str) -> bool:
+        acquired = await self._redis.set(
+            self._lease_key(subject), WORKER_ID,
+            nx=True, px=int(REFILL_LEASE_TTL * 1000)
+        )
+        return bool(acquired)
+
+    async def release_refill(self, subject: str):
+        await self._redis.eval(self.RELEASE_SCRIPT, 1, self._lease_key(subject), WORKER_ID)
+
+
+def make_backend():
+    if BUFFER_BACKEND == "sqlite":
+        return SqliteBackend()
+    if BUFFER_BACKEND == "redis":
+        return RedisBackend(REDIS_URL)
+    return MemoryBackend()
@@ -0,0 +1,238 @@
+import os
+import random
+import re
+import threading
+import zlib
+from array import array
+
+import storage
+
+# MinHash / LSH settings: 16 bands x 4 rows flags pairs around 50%
+# Jaccard as candidates, which are then checked against the threshold
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+SIMILARITY_THRESHOLD = 0.7
+
+# Most recent questions kept in the index; older ones are evicted first
+DEDUP_INDEX_MAX = int(os.getenv("DEDUP_INDEX_MAX", "20000"))
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1234)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(NUM_PERM)
+]
+
+# Per-subject counters
+DEDUP_STATS = {}
+
+
+# ================= SIGNATURES =================
+def normalize(text: str) -> str:
+    text = re.sub(r"[^a-z0-9]+", " ", (text or "").lower())
+    return text.strip()
+
+
+def shingles(text: str) -> set:
+    words = normalize(text).split()
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode())}
+
+    return {
+        zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode())
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def signature(text: str) -> tuple:
+    hashes = shingles(text)
+    return tuple(
+        min((a * h + b) % _PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def similarity(sig_a: tuple, sig_b: tuple) -> float:
+    same = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+    return same / NUM_PERM
+
+
+# ================= LSH INDEX =================
+class DedupIndex:
+    """
+    One entry per question id, at most max_size entries (oldest evicted).
+    Signatures are packed arrays and most band buckets a bare slot:
+    about 2.5 KB per question.
+    """
+
+    def __init__(self, max_size: int = DEDUP_INDEX_MAX):
+        self.max_size = max_size
+        # question id -> slot, in insertion order (eviction order)
+        self._keys = {}
+        self._signatures = {}
+        self._bands = [{} for _ in range(BANDS)]
+        self._next_slot = 0
+        # History is seeded from a worker thread while requests add too
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, key: str):
+        return key in self._keys
+
+    def _band_keys(self, sig):
+        for band in range(BANDS):
+            yield band, hash(tuple(sig[band * ROWS:(band + 1) * ROWS]))
+
+    def best_match(self, sig) -> float:
+        with self._lock:
+            candidates = set()
+            for band, key in self._band_keys(sig):
+                bucket = self._bands[band].get(key)
+                if isinstance(bucket, int):
+                    candidates.add(bucket)
+                elif bucket:
+                    candidates.update(bucket)
+
+            return max(
+                (similarity(sig, self._signatures[slot]) for slot in candidates),
+                default=0.0
+            )
+
+    def add(self, key: str, sig):
+        with self._lock:
+            if key in self._keys:
+                return
+
+            slot = self._next_slot
+            self._next_slot += 1
+            self._keys[key] = slot
+            self._signatures[slot] = array("Q", sig)
+            for band, band_key in self._band_keys(sig):
+                # Most buckets hold one slot: a bare int, not a set
+                bucket = self._bands[band].get(band_key)
+                if bucket is None:
+                    self._bands[band][band_key] = slot
+                elif isinstance(bucket, int):
+                    self._bands[band][band_key] = {bucket, slot}
+                else:
+                    bucket.add(slot)
+
+            while len(self._keys) > self.max_size:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        key = next(iter(self._keys))
+        slot = self._keys.pop(key)
+        sig = self._signatures.pop(slot)
+        for band, band_key in self._band_keys(sig):
+            bucket = self._bands[band][band_key]
+            if isinstance(bucket, int):
+                del self._bands[band][band_key]
+                continue
+            bucket.discard(slot)
+            if len(bucket) == 1:
+                self._bands[band][band_key] = bucket.pop()
+
+
+INDEX = DedupIndex()
+
+
+def _key(question: dict) -> str:
+    return question.get("id") or storage.question_id(question)
+
+
+def seed(questions):
+    """
+    Indexes already buffered or stored questions (dicts); ids already
+    in the index are skipped.
+    """
+    for question in questions:
+        key = _key(question)
+        if key not in INDEX:
+            INDEX.add(key, signature(question.get("question", "")))
+
+
+def seed_in_background(questions):
+    """
+    Indexes a long iterable (e.g. the stored questions) on a daemon
+    thread; questions generated meanwhile are still checked and indexed.
+    """
+    def run():
+        try:
+            seed(questions)
+        except Exception as e:
+            print("⚠️ Dedup seeding failed:", e)
+            return
+        print(f"✅ Dedup index seeded from history ({len(INDEX)} questions indexed)")
+
+    threading.Thread(target=run, name="dedup-seed", daemon=True).start()
+
+
+def is_duplicate(subject: str, question: dict) -> bool:
+    """
+    Checks a new question and indexes it when it is not a duplicate.
+    """
+    stats = DEDUP_STATS.setdefault(subject, {"checked": 0, "dropped": 0})
+    stats["checked"] += 1
+
+    sig = signature(question.get("question", ""))
+    if INDEX.best_match(sig) >= SIMILARITY_THRESHOLD:
+        stats["dropped"] += 1
+        return True
+
+    INDEX.add(_key(question), sig)
+    return False
+
+
+def deduplicated(generate_fn):
+    """
+    Wraps a generator (list or streaming) so near-duplicates never
+    reach the buffer.
+    """
+    async def generate(subject: str):
+        result = generate_fn(subject)
+
+        if hasattr(result, "__aiter__"):
+            async for question in result:
+                if not is_duplicate(subject, question):
+                    yield question
+        else:
+            for question in await result or []:
+                if not is_duplicate(subject, question):
+                    yield question
+
+    return generate
+
+
+def deduplicated_batch(batch_fn):
+    """
+    Same as deduplicated, for multi-subject generators returning
+    {subject: [questions]}.
+    """
+    async def generate(subjects: list) -> dict:
+        grouped = await batch_fn(subjects)
+        return {
+            subject: [q for q in questions if not is_duplicate(subject, q)]
+            for subject, questions in grouped.items()
+        }
+
+    return generate
+
+
+def stats() -> dict:
+    return {
+        "indexed": len(INDEX),
+        "max_indexed": INDEX.max_size,
+        "subjects": {
+            subject: {
+                **counts,
+                "dedup_ratio": round(counts["dropped"] / counts["checked"], 3)
+                if counts["checked"] else 0.0
+            }
+            for subject, counts in DEDUP_STATS.items()
+        }
+    }
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+import httpx
+
+import metrics
+import question_pool
+import storage
+
+# Flush settings
+DOCS_FLUSH_WINDOW = float(os.getenv("DOCS_FLUSH_WINDOW", "2"))
+DOCS_POLL_INTERVAL = float(os.getenv("DOCS_POLL_INTERVAL", "60"))
+DOCS_MAX_BATCH = int(os.getenv("DOCS_MAX_BATCH", "100"))
+
+# Retry settings
+DOCS_MAX_RETRIES = int(os.getenv("DOCS_MAX_RETRIES", "5"))
+DOCS_BACKOFF_BASE = float(os.getenv("DOCS_BACKOFF_BASE", "1"))
+DOCS_BACKOFF_MAX = 60.0
+
+DEAD_LETTER_FILE = os.path.join(storage.DATA_DIR, "google_docs_dead_letter.jsonl")
+
+# Last attempt id already pushed to the doc
+CURSOR_KEY = "docs_synced_id"
+
+# With several uvicorn workers only the lease holder moves the cursor.
+# Renewed per batch; must outlast one batch's retries
+DOCS_LEASE = "docs-sync"
+DOCS_LEASE_TTL = float(os.getenv("DOCS_LEASE_TTL", "600"))
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def format_attempt(attempt: dict) -> str:
+    # Stored attempts may lack fields; a missing key must never stall the cursor
+    return f"""
+Q. {attempt.get('question')}
+Options: {attempt.get('options')}
+Selected: {attempt.get('selected_option')}
+Correct: {attempt.get('correct_option')}
+Explanation: {attempt.get('explanation')}
+Result: {attempt.get('result')}
+------------------------------
+"""
+
+
+# ================= TRANSPORTS =================
+class GoogleApiTransport:
+    """
+    Sends batchUpdate through googleapiclient with one long-lived service.
+    """
+
+    def batch_update(self, doc_id: str, requests: list):
+        storage.get_docs_service().documents().batchUpdate(
+            documentId=doc_id,
+            body={"requests": requests}
+        ).execute()
+
+
+class HttpTransport:
+    """
+    Sends batchUpdate as plain REST to GOOGLE_DOCS_ENDPOINT.
+    Used with a local fake Docs server (bench/fake_docs.py).
+    """
+
+    def __init__(self, base_url: str, token: str = None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self._client = httpx.Client(base_url=base_url, headers=headers, timeout=30)
+
+    def batch_update(self, doc_id: str, requests: list):
+        response = self._client.post(
+            f"/v1/documents/{doc_id}:batchUpdate",
+            json={"requests": requests}
+        )
+        response.raise_for_status()
+
+
+def make_transport():
+    endpoint = os.getenv("GOOGLE_DOCS_ENDPOINT")
+    if endpoint:
+        return HttpTransport(endpoint, os.getenv("GOOGLE_DOCS_TOKEN"))
+
+    if os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON"):
+        return GoogleApiTransport()
+
+    return None
+
+
+# ================= OUTBOUND WORKER =================
+class DocsSyncWorker:
+    """
+    Pushes stored attempts to the Google Doc in the background.
+
+    The attempt store doubles as the outbox: everything after the
+    synced cursor is pending, so nothing is lost across restarts.
+    """
+
+    def __init__(self, transport, doc_id: str):
+        self.transport = transport
+        self.doc_id = doc_id
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+
+    def notify(self):
+        # Safe to call from threadpool endpoints
+        self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def run(self):
+        if await asyncio.to_thread(storage.get_meta, CURSOR_KEY) is None:
+            # History before the first start is already in the doc
+            last_id = await asyncio.to_thread(storage.last_attempt_id)
+            await asyncio.to_thread(storage.set_meta, CURSOR_KEY, last_id)
+
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), DOCS_POLL_INTERVAL)
+                # Let the rest of the burst arrive
+                await asyncio.sleep(DOCS_FLUSH_WINDOW)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wake.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                print("⚠️ Google Docs sync failed:", e)
+
+    async def flush(self):
+        try:
+            await self._flush_leased()
+        finally:
+            await asyncio.to_thread(question_pool.release_lease, DOCS_LEASE, WORKER_ID)
+
+    async def _flush_leased(self):
+        while True:
+            # Another worker is syncing: it will pick these attempts up
+            if not await asyncio.to_thread(
+                question_pool.acquire_lease, DOCS_LEASE, WORKER_ID, DOCS_LEASE_TTL
+            ):
+                return
+
+            after_id = int(await asyncio.to_thread(storage.get_meta, CURSOR_KEY, 0))
+            batch = await asyncio.to_thread(
+                storage.load_attempts_after, after_id, DOCS_MAX_BATCH
+            )
+            if not batch:
+                return
+
+            # Newest first, same order as one insert per attempt at index 1
+            text = "".join(
+                format_attempt(attempt) + "\n\n" for _, attempt in reversed(batch)
+            )
+            requests = [{"insertText": {"location": {"index": 1}, "text": text}}]
+
+            error = await self._send(requests)
+            if error is not None:
+                self._dead_letter(batch, text, error)
+
+            await asyncio.to_thread(storage.set_meta, CURSOR_KEY, batch[-1][0])
+
+    async def _send(self, requests: list):
+        error = None
+
+        for attempt in range(DOCS_MAX_RETRIES):
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(
+                    self.transport.batch_update, self.doc_id, requests
+                )
+                metrics.DOCS_APPEND_SECONDS.observe(time.perf_counter() - started, "ok")
+                return None
+            except Exception as e:
+                metrics.DOCS_APPEND_SECONDS.observe(time.perf_counter() - started, "error")
+                error = e
+                delay = min(DOCS_BACKOFF_MAX, DOCS_BACKOFF_BASE * 2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, DOCS_BACKOFF_BASE))
+
+        return error
+
+    def _dead_letter(self, batch: list, text: str, error: Exception):
+        print(f"⚠️ Google Docs sync gave up on {len(batch)} attempts:", error)
+
+        with open(DEAD_LETTER_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "failed_at": time.time(),
+                "error": str(error),
+                "attempt_ids": [row_id for row_id, _ in batch],
+                "text": text
+            }, ensure_ascii=False) + "\n")
+
+
+_worker = None
+_task = None
+
+
+def start():
+    global _worker, _task
+
+    transport = make_transport()
+    if transport is None:
+        print("ℹ️ Google Docs sync disabled (no credentials)")
+        return
+
+    _worker = DocsSyncWorker(transport, os.getenv("GOOGLE_DOC_ID"))
+    _task = asyncio.create_task(_worker.run())
+
+
+def backlog():
+    """
+    Saved attempts not yet sent to Google Docs (None when sync is off).
+    """
+    if _worker is None:
+        return None
+    return storage.last_attempt_id() - int(storage.get_meta(CURSOR_KEY, 0))
+
+
+def notify():
+    if _worker is not None:
+        _worker.notify()
+
+
+async def stop():
+    global _worker, _task
+
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+
+    _worker = None
+    _task = None
@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+
+import storage
+
+# Attempts read from the store per page; one page is one chunk sent
+EXPORT_PAGE_SIZE = 500
+
+CSV_COLUMNS = [
+    "id", "created_at", "subject", "difficulty", "question",
+    "option_a", "option_b", "option_c", "option_d",
+    "selected_option", "correct_option", "result", "explanation", "session"
+]
+
+MEDIA_TYPES = {
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "txt": "text/plain; charset=utf-8"
+}
+
+
+def _letter(index):
+    return chr(65 + index) if isinstance(index, int) and 0 <= index < 26 else "-"
+
+
+def _jsonl(attempt: dict, number: int) -> str:
+    return json.dumps(attempt, ensure_ascii=False) + "\n"
+
+
+def _csv(attempt: dict, number: int) -> str:
+    options = list(attempt.get("options") or [])[:4]
+    options += [""] * (4 - len(options))
+    row = {column: attempt.get(column) for column in CSV_COLUMNS}
+    row.update(zip(("option_a", "option_b", "option_c", "option_d"), options))
+
+    out = io.StringIO()
+    csv.DictWriter(out, fieldnames=CSV_COLUMNS, extrasaction="ignore").writerow(row)
+    return out.getvalue()
+
+
+def _txt(attempt: dict, number: int) -> str:
+    # Same layout as the frontend's session TXT download
+    lines = [f"Q{number}. {attempt.get('question')}"]
+    for idx, opt in enumerate(attempt.get("options") or []):
+        lines.append(f"   {chr(65 + idx)}. {opt}")
+    lines.append(f"Selected Answer: {_letter(attempt.get('selected_option'))}")
+    lines.append(f"Correct Answer: {_letter(attempt.get('correct_option'))}")
+    lines.append(f"Result: {attempt.get('result')}")
+    lines.append(f"Explanation: {attempt.get('explanation')}")
+    lines.append("-" * 60)
+    return "\n".join(lines) + "\n"
+
+
+FORMATTERS = {"jsonl": _jsonl, "csv": _csv, "txt": _txt}
+
+
+def stream(fmt: str, subject: str = None):
+    """
+    Yields the export one page of attempts at a time, oldest first.
+    Only one page is ever held in memory.
+    """
+    formatter = FORMATTERS[fmt]
+
+    if fmt == "csv":
+        out = io.StringIO()
+        csv.writer(out).writerow(CSV_COLUMNS)
+        # First bytes go out before the store is read
+        yield out.getvalue()
+
+    chunk = []
+    for number, attempt in enumerate(
+        storage.iter_attempts(page_size=EXPORT_PAGE_SIZE, subject=subject), start=1
+    ):
+        chunk.append(formatter(attempt, number))
+        if len(chunk) >= EXPORT_PAGE_SIZE:
+            yield "".join(chunk)
+            chunk = []
+
+    if chunk:
+        yield "".join(chunk)
+
+
+def filename(fmt: str, subject: str = None) -> str:
+    scope = subject.replace(" ", "_").replace("/", "-") if subject else "All"
+    return f"BEL_PE_{scope}_Attempts.{fmt}"
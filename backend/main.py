@@ -1,83 +1,513 @@
+from contextlib import asynccontextmanager
 import asyncio
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
-from fastapi import Body
+import time
 
-from agent import generate_mcqs
+from fastapi import FastAPI, HTTPException, Request
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi import Body, Header
+
+import agent
+from agent import generate_mcqs, generate_mcqs_batch, generate_mcqs_stream
+import buffer
 from buffer import (
-    QUESTION_BUFFER,
-    ensure_subject,
-    refill_buffer,
-    LOW_WATER_MARK
+    depth,
+    restore_buffers,
+    get_question
+)
+import dedup
+import docs_sync
+import export
+import metrics
+import mock_test
+import pdf_cache
+import pdf_jobs
+import prefetch
+import question_pool
+import resilience
+import sessions
+import startup
+import storage
+from schemas import parse_attempt
+from storage import save_question, save_questions
+
+# orjson (optional) serializes several times faster than the stdlib
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class DefaultResponse(JSONResponse):
+    # Own class: FastAPI's ORJSONResponse is deprecated in newer releases
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+# Only bulk responses (question batches, attempt pages, mock papers,
+# exports) are gzipped; PDFs are already compressed and keep their ETag
+GZIP_MIN_SIZE = 1024
+GZIP_PATHS = ("/next-questions", "/attempts", "/mock-test", "/export")
+
+
+class BulkGZipMiddleware:
+    def __init__(self, app, minimum_size: int = GZIP_MIN_SIZE):
+        self.app = app
+        self.gzip = GZipMiddleware(
+            app,
+            minimum_size=minimum_size,
+            exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/pdf",)
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(GZIP_PATHS):
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+# Streaming pushes each question into the buffer as soon as it is parsed;
+# near-duplicates of buffered or attempted questions are dropped on the way
+generate_fn = dedup.deduplicated(
+    resilience.resilient_stream(generate_mcqs_stream)
+    if agent.LLM_STREAM
+    else resilience.resilient(generate_mcqs)
 )
-from storage import save_question, load_all_questions, append_to_google_doc
-from pdf_generator import generate_pdf, generate_subject_pdf
 
-app = FastAPI()
+# Several low subjects in one LLM call
+batch_fn = dedup.deduplicated_batch(resilience.resilient(generate_mcqs_batch))
+
+
+# -------------------- LIFESPAN --------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared keep-alive LLM client
+    agent.start_client()
+
+    # Questions generated before the last restart are served first
+    restored = await restore_buffers()
+    if restored:
+        print(f"✅ Restored {len(restored)} buffered questions from the pool")
+
+    # Buffered before question ids existed: give them one
+    await asyncio.to_thread(storage.save_generated, restored)
 
+    # Dedup index covers everything buffered or already stored, one entry
+    # per question id. Stored questions (newest DEDUP_INDEX_MAX) are
+    # indexed in the background, so startup does not wait on the history
+    dedup.seed(restored)
+    dedup.seed_in_background(storage.iter_questions(limit=dedup.DEDUP_INDEX_MAX))
 
-# -------------------- STARTUP --------------------
-@app.on_event("startup")
-async def startup_event():
-    # Optional warm-up
-    asyncio.create_task(refill_buffer("Data Structures", generate_mcqs))
+    # Most-used subjects are filled concurrently in the background
+    startup.start_warm_up(generate_fn)
+
+    # Every subject pool holds a full mock paper
+    if mock_test.MOCK_WARM_ON_START:
+        mock_test.start_warming(generate_fn)
+
+    # Background Google Docs persistence
+    docs_sync.start()
+
+    # PDF rendering process pool
+    pdf_jobs.start()
+
+    startup.mark("ready")
+    yield
+
+    pdf_jobs.shutdown()
+
+    await docs_sync.stop()
+    await agent.close_client()
+    question_pool.close()
+
+    # Flush queued attempts before the process exits
+    storage.close()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=DefaultResponse)
+app.add_middleware(BulkGZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+
+startup.mark("imported")
+
+
+# -------------------- METRICS --------------------
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+
+    # Route template, not the raw path, keeps label cardinality bounded
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        request.method,
+        route.path if route is not None else "unmatched",
+        response.status_code
+    )
+    return response
+
+
+def _collect_stats():
+    for event, value in resilience.RESILIENCE_STATS.items():
+        metrics.LLM_RESILIENCE.set_total(value, event)
+    metrics.LLM_BREAKER_OPEN.set(0 if resilience.BREAKER.state == "closed" else 1)
+    metrics.PDF_JOBS_PENDING.set(len(pdf_jobs.IN_FLIGHT))
+    backlog = docs_sync.backlog()
+    if backlog is not None:
+        metrics.DOCS_BACKLOG.set(backlog)
+
+
+metrics.COLLECTORS.append(_collect_stats)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    # Prometheus text format; depths and backlog are read at scrape time
+    for subject in list(buffer.BUFFER_CONDITIONS):
+        metrics.BUFFER_DEPTH.set(await depth(subject), subject)
+
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 # -------------------- NEXT QUESTION --------------------
+# Seconds a client waits before asking again after an all-duplicate refill
+NO_QUESTIONS_RETRY_AFTER = 5
+
+
 @app.get("/next-question")
-async def next_question(subject: str = "Data Structures"):
-    ensure_subject(subject)
+async def next_question(subject: str = "Data Structures", session: str = None):
+    # Serve instantly, or wait for the first question of the in-flight refill.
+    # Background refills are triggered by the prefetch controller.
+    try:
+        if session is None:
+            question = await get_question(subject, generate_fn, batch_fn)
+        else:
+            # Session-aware: next unseen question from the shared pool
+            question = await sessions.next_question(
+                session, subject, lambda s: get_question(s, generate_fn, batch_fn)
+            )
+        startup.first_question_served()
+        return question
+    except resilience.CircuitOpen as e:
+        # Buffer is empty and the LLM is failing: fail fast
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(resilience.BREAKER.retry_after()) + 1)}
+        )
+    except buffer.NoQuestionsGenerated as e:
+        # Every regeneration came back as near-duplicates; try again shortly
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(NO_QUESTIONS_RETRY_AFTER)}
+        )
+
+
+# -------------------- NEXT QUESTIONS (BULK) --------------------
+NEXT_QUESTIONS_MAX = 10
+
 
-    # Trigger background refill (NON-BLOCKING)
-    if len(QUESTION_BUFFER[subject]) <= LOW_WATER_MARK:
-        asyncio.create_task(refill_buffer(subject, generate_mcqs))
+@app.get("/next-questions")
+async def next_questions(subject: str = "Data Structures", n: int = 5, session: str = None):
+    # Only the first question may wait on a refill; the rest are
+    # whatever is already buffered, so a batch is never slower than one
+    n = max(1, min(n, NEXT_QUESTIONS_MAX))
+    questions = [await next_question(subject, session)]
 
-    # First time / emergency fill
-    if not QUESTION_BUFFER[subject]:
-        await refill_buffer(subject, generate_mcqs)
+    def get_ready(s):
+        return get_question(s, generate_fn, batch_fn, wait=False)
 
-    # Serve instantly
-    return QUESTION_BUFFER[subject].pop(0)
+    while len(questions) < n:
+        if session is None:
+            question = await get_ready(subject)
+        else:
+            question = await sessions.next_question(session, subject, get_ready)
+        if question is None:
+            break
+        questions.append(question)
+
+    return questions
+
+
+# -------------------- LLM STATS --------------------
+@app.get("/llm-stats")
+async def llm_stats():
+    # Time to first question next to full-batch latency, per subject,
+    # prompt/response tokens per call and accepted questions per call
+    return {
+        "subjects": agent.GENERATION_STATS,
+        "tokens": agent.usage_stats(),
+        "yield": agent.yield_stats(),
+        "resilience": resilience.status()
+    }
+
+
+# -------------------- PREFETCH STATUS --------------------
+@app.get("/prefetch-status")
+async def prefetch_status():
+    # Per-subject watermarks, demand, dry runs and recent decisions
+    status = prefetch.status()
+    for subject, info in status["subjects"].items():
+        info["depth"] = await depth(subject)
+    return status
+
+
+# -------------------- STARTUP STATS --------------------
+@app.get("/startup-stats")
+async def startup_stats():
+    # Seconds from process start to import, ready, warm-up and first question
+    return startup.status()
+
+
+# -------------------- DEDUP STATS --------------------
+@app.get("/dedup-stats")
+async def dedup_stats():
+    # Dropped near-duplicates and dedup ratio per subject
+    return dedup.stats()
+
+
+# -------------------- SESSION STATS --------------------
+@app.get("/sessions-stats")
+async def sessions_stats():
+    # Active sessions, shared pool sizes and how often the LLM was needed
+    return sessions.stats()
 
 
 # -------------------- SAVE ANSWER --------------------
 @app.post("/save-attempt")
 def save_attempt(attempt: dict = Body(...)):
-    save_question(attempt)
-    formatted = f"""
-Q. {attempt['question']}
-Options: {attempt['options']}
-Selected: {attempt['selected_option']}
-Correct: {attempt['correct_option']}
-Explanation: {attempt['explanation']}
-Result: {attempt['result']}
-------------------------------
-"""
-    append_to_google_doc(formatted)
+    # Durable locally; Google Docs is synced in the background.
+    # {question_id, selected_option, session} is enough; full attempts
+    # from older clients are still accepted
+    try:
+        save_question(parse_attempt(attempt))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    docs_sync.notify()
     return {"status": "saved"}
 
 
-# -------------------- ALL QUESTIONS PDF --------------------
-@app.get("/download-pdf")
-def download_all_pdf():
-    questions = load_all_questions()
-    pdf_path = generate_pdf(questions)
+# -------------------- SAVE ANSWERS (BULK) --------------------
+SAVE_ATTEMPTS_MAX = 500
 
-    return FileResponse(
-        pdf_path,
-        media_type="application/pdf",
-        filename="BEL_PE_All_Practice_Questions.pdf"
+
+@app.post("/save-attempts")
+def save_attempts(attempts: list = Body(...)):
+    # Buffered client-side attempts, committed in one transaction
+    if len(attempts) > SAVE_ATTEMPTS_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {SAVE_ATTEMPTS_MAX} attempts per request")
+    if not all(isinstance(attempt, dict) for attempt in attempts):
+        raise HTTPException(status_code=422, detail="Expected a list of attempt objects")
+
+    # Valid attempts are saved even if others are not; rejected ones are
+    # reported by index, so a client never retries them forever
+    parsed, rejected = [], []
+    for index, attempt in enumerate(attempts):
+        try:
+            parsed.append((index, parse_attempt(attempt)))
+        except ValueError as e:
+            rejected.append({"index": index, "error": str(e)})
+
+    # e.g. question ids from a store that has since been reset
+    known = storage.get_questions(
+        attempt["question_id"] for _, attempt in parsed if "question" not in attempt
     )
+    accepted = []
+    for index, attempt in parsed:
+        if "question" in attempt or attempt["question_id"] in known:
+            accepted.append(attempt)
+        else:
+            rejected.append({"index": index, "error": f"Unknown question_id: {attempt['question_id']}"})
 
+    save_questions(accepted)
+    if accepted:
+        docs_sync.notify()
+    rejected.sort(key=lambda item: item["index"])
+    return {"status": "saved", "count": len(accepted), "rejected": rejected}
+
+
+# -------------------- STATS --------------------
+@app.get("/stats")
+def attempt_stats():
+    # All-time, per subject and per difficulty accuracy, streaks and
+    # 24h/7d windows; maintained on every save, so constant time
+    return storage.load_stats()
+
+
+# -------------------- MOCK TEST --------------------
+@app.get("/mock-test/blueprint")
+async def mock_test_blueprint():
+    # Questions per subject in one paper, and pool readiness; asking is
+    # enough to start warming pools that cannot fill a paper yet
+    plan = mock_test.blueprint()
+    missing = await mock_test.missing(plan)
+    if missing:
+        mock_test.start_warming(generate_fn)
+
+    return {
+        "size": mock_test.MOCK_TEST_SIZE,
+        "duration_minutes": mock_test.MOCK_TEST_MINUTES,
+        "ready": not missing,
+        "subjects": {
+            subject: {"questions": count, "ready": await depth(subject)}
+            for subject, count in plan.items()
+        },
+        "stats": await asyncio.to_thread(mock_test.stats)
+    }
+
+
+def _pools_warming(detail: str):
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": str(mock_test.MOCK_RETRY_AFTER)}
+    )
+
+
+@app.post("/mock-test")
+async def create_mock_test():
+    # Assembled from the warm subject pools, no LLM call on this path
+    try:
+        paper = await mock_test.assemble(generate_fn)
+    except mock_test.PoolsWarming as e:
+        raise _pools_warming(str(e))
+    if not paper["questions"]:
+        raise _pools_warming("Question pools are still warming up")
+    return mock_test.public_paper(paper)
+
+
+@app.get("/mock-test/{paper_id}")
+async def get_mock_test(paper_id: str):
+    paper = await asyncio.to_thread(mock_test.get, paper_id)
+    if paper is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired mock test")
+    return mock_test.public_paper(paper)
+
+
+@app.post("/mock-test/{paper_id}/submit")
+def submit_mock_test(paper_id: str, answers: dict = Body(..., embed=True)):
+    # answers: {"<question index>": selected option}, unanswered left out
+    paper = mock_test.get(paper_id)
+    if paper is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired mock test")
+
+    try:
+        selected = mock_test.parse_answers(paper, answers)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    result = mock_test.score(paper, selected)
+    docs_sync.notify()
+    return result
+
+
+# -------------------- ATTEMPTS --------------------
+@app.get("/attempts")
+def list_attempts(
+    subject: str = None,
+    result: str = None,
+    since: float = None,
+    until: float = None,
+    cursor: int = 0,
+    limit: int = 100
+):
+    # Reads only matching rows through the subject/result/time indexes
+    items, next_cursor = storage.query_attempts(
+        subject=subject,
+        result=result,
+        since=since,
+        until=until,
+        after_id=cursor,
+        limit=max(1, min(limit, 500))
+    )
+    return {"items": items, "next_cursor": next_cursor}
 
-# -------------------- SUBJECT PDF --------------------
-@app.get("/download-pdf/{subject}")
-def download_subject_pdf(subject: str):
-    questions = load_all_questions()
-    pdf_path = generate_subject_pdf(questions, subject)
 
+# -------------------- EXPORT --------------------
+@app.get("/export")
+def export_attempts(format: str = "jsonl", subject: str = None):
+    # Streamed page by page from the store: flat memory, first bytes at once
+    if format not in export.FORMATTERS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"format must be one of: {', '.join(export.FORMATTERS)}"
+        )
+
+    return StreamingResponse(
+        export.stream(format, subject),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{export.filename(format, subject)}"'}
+    )
+
+
+# -------------------- PDF JOBS --------------------
+def _submit_pdf_job(subject: str = None):
+    try:
+        return pdf_jobs.submit(subject)
+    except pdf_jobs.PdfQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def _job_or_404(job_id: str):
+    job = pdf_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown PDF job")
+    return job
+
+
+@app.post("/pdf-jobs")
+async def create_pdf_job(subject: str = None):
+    return _submit_pdf_job(subject).to_dict()
+
+
+@app.get("/pdf-jobs/{job_id}")
+async def pdf_job_status(job_id: str, wait: float = 0):
+    # wait > 0 long-polls until the job finishes or the wait runs out
+    job = _job_or_404(job_id)
+    if wait > 0:
+        await pdf_jobs.wait(job, timeout=wait)
+    return job.to_dict()
+
+
+@app.get("/pdf-jobs/{job_id}/file")
+async def pdf_job_file(job_id: str):
+    job = _job_or_404(job_id)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"PDF job is {job.status}")
+
+    filename = (
+        "BEL_PE_All_Practice_Questions.pdf" if job.subject is None
+        else f"BEL_PE_{job.subject.replace(' ', '_')}.pdf"
+    )
     return FileResponse(
-        pdf_path,
+        job.path,
         media_type="application/pdf",
-        filename=f"BEL_PE_{subject.replace(' ', '_')}.pdf"
+        filename=filename,
+        headers={"ETag": job.etag}
     )
+
+
+async def _render_and_send(subject: str, if_none_match: str):
+    # Nothing saved since the client's copy: no rendering at all
+    etag = pdf_cache.pdf_etag(subject)
+    if pdf_cache.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    job = await pdf_jobs.wait(_submit_pdf_job(subject))
+    if job.status != "done":
+        raise HTTPException(status_code=500, detail=f"PDF generation failed: {job.error}")
+
+    return await pdf_job_file(job.id)
+
+
+# -------------------- ALL QUESTIONS PDF --------------------
+@app.get("/download-pdf")
+async def download_all_pdf(if_none_match: str = Header(None)):
+    return await _render_and_send(None, if_none_match)
+
+
+# -------------------- SUBJECT PDF --------------------
+@app.get("/download-pdf/{subject}")
+async def download_subject_pdf(subject: str, if_none_match: str = Header(None)):
+    return await _render_and_send(subject, if_none_match)
@@ -0,0 +1,171 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Minimal Prometheus text-format metrics.
+# Updates are a dict lookup and an add under an uncontended lock;
+# anything derived (depths, breaker state) is collected at scrape time.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LLM_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REGISTRY = []
+
+# Functions run before each scrape to refresh gauges
+COLLECTORS = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: tuple = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set_total(self, value: float, *labels):
+        # For counters mirrored from an existing stats dict at scrape time
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> list:
+        lines = self._header()
+        with self._lock:
+            for labels, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        self.set_total(value, *labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels):
+        # Per-bucket counts; cumulated only when rendering
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self) -> list:
+        lines = self._header()
+        with self._lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._values.items()]
+
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labels, labels, (('le', le),))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {count}")
+        return lines
+
+
+def render() -> str:
+    for collect in COLLECTORS:
+        try:
+            collect()
+        except Exception as e:
+            print("⚠️ Metrics collector failed:", e)
+
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ================= METRICS =================
+HTTP_REQUEST_SECONDS = Histogram(
+    "bel_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+
+QUESTIONS_SERVED = Counter(
+    "bel_questions_served_total", "Questions served, from the buffer or after waiting on a refill",
+    ("subject", "source")
+)
+QUESTION_WAIT_SECONDS = Histogram(
+    "bel_question_wait_seconds", "Time /next-question waited on an empty buffer", ("subject",), LLM_BUCKETS
+)
+BUFFER_DEPTH = Gauge("bel_buffer_depth", "Buffered questions per subject", ("subject",))
+REFILLS = Counter("bel_refills_total", "Buffer refills by outcome", ("subject", "outcome"))
+
+LLM_REQUEST_SECONDS = Histogram(
+    "bel_llm_request_duration_seconds", "LLM call latency", ("mode", "outcome"), LLM_BUCKETS
+)
+LLM_TOKENS = Counter("bel_llm_tokens_total", "Prompt/response tokens reported by the LLM", ("kind",))
+MCQ_VALIDATION = Counter("bel_mcq_validation_total", "Generated questions by validation result", ("result",))
+LLM_RESILIENCE = Counter(
+    "bel_llm_resilience_events_total", "Retries, hedges and circuit-breaker rejections", ("event",)
+)
+LLM_BREAKER_OPEN = Gauge("bel_llm_breaker_open", "1 while the LLM circuit breaker is not closed")
+
+STORAGE_SAVE_SECONDS = Histogram("bel_storage_save_seconds", "save_question latency (until committed)")
+STORAGE_COMMIT_SIZE = Histogram(
+    "bel_storage_commit_batch_size", "Attempts per group commit", buckets=SIZE_BUCKETS
+)
+DOCS_APPEND_SECONDS = Histogram(
+    "bel_docs_append_seconds", "Google Docs batchUpdate latency", ("outcome",)
+)
+DOCS_BACKLOG = Gauge("bel_docs_backlog", "Saved attempts not yet synced to Google Docs")
+
+PDF_JOB_SECONDS = Histogram(
+    "bel_pdf_job_duration_seconds", "PDF export latency (queue + render + merge)", ("status",)
+)
+PDF_JOBS_PENDING = Gauge("bel_pdf_jobs_pending", "PDF exports queued or rendering")
+
+STARTUP_SECONDS = Gauge(
+    "bel_startup_seconds", "Seconds from process start to each startup phase", ("phase",)
+)
@@ -0,0 +1,289 @@
+import asyncio
+import os
+import time
+import uuid
+
+import buffer
+import storage
+from agent import SUBJECTS
+
+# Full-length paper, weighted by the prompt's subject priority
+MOCK_TEST_SIZE = int(os.getenv("MOCK_TEST_SIZE", "100"))
+MOCK_TEST_MINUTES = int(os.getenv("MOCK_TEST_MINUTES", "120"))
+MOCK_NEGATIVE_MARK = float(os.getenv("MOCK_NEGATIVE_MARK", "0"))
+
+# Pools are warmed after each paper; warming all ten subjects at startup
+# is opt-in. Both use the warm-up slots shared with startup warming
+MOCK_WARM_ON_START = os.getenv("MOCK_WARM_ON_START", "0") == "1"
+
+# Until every subject can fill its share, POST /mock-test answers 503
+# (pools warming in the background); 1 hands out short papers instead
+MOCK_ALLOW_SHORT_PAPERS = os.getenv("MOCK_ALLOW_SHORT_PAPERS", "0") == "1"
+MOCK_RETRY_AFTER = 10
+
+# Submitted or abandoned papers are kept this long
+MOCK_PAPER_TTL_SECONDS = float(os.getenv("MOCK_PAPER_TTL_SECONDS", str(6 * 3600)))
+
+# Relative weights, in SUBJECTS (priority) order
+WEIGHTS = {
+    "Data Structures": 16,
+    "Operating Systems": 12,
+    "Computer Networks": 12,
+    "DBMS": 12,
+    "Compiler Design": 8,
+    "Digital Logic": 8,
+    "Object-Oriented Programming (OOPs)": 8,
+    "Computer Architecture": 8,
+    "Algorithms": 10,
+    "Artificial Intelligence / Machine Learning (BASIC ONLY)": 6,
+}
+
+MOCK_STATS = {"papers": 0, "submitted": 0, "short_papers": 0, "warm_runs": 0}
+
+_warm_task = None
+
+
+class PoolsWarming(Exception):
+    """
+    Not every subject has its share buffered yet; warming is under way.
+    """
+
+    def __init__(self, missing: dict):
+        super().__init__(f"Question pools are still warming up: {missing}")
+        self.missing = missing
+
+
+def blueprint(total: int = MOCK_TEST_SIZE) -> dict:
+    """
+    {subject: questions} summing to total (largest remainder rounding).
+    """
+    weight_sum = sum(WEIGHTS[subject] for subject in SUBJECTS)
+    exact = {subject: total * WEIGHTS[subject] / weight_sum for subject in SUBJECTS}
+    counts = {subject: int(value) for subject, value in exact.items()}
+
+    leftover = total - sum(counts.values())
+    by_remainder = sorted(SUBJECTS, key=lambda s: exact[s] - counts[s], reverse=True)
+    for subject in by_remainder[:leftover]:
+        counts[subject] += 1
+
+    return counts
+
+
+# ================= WARMING =================
+async def warm_pools(generate_fn):
+    """
+    Brings every subject's buffer up to one paper's worth of questions,
+    within buffer.WARM_CONCURRENCY generations at once.
+    """
+    MOCK_STATS["warm_runs"] += 1
+    await buffer.warm(blueprint(), generate_fn)
+
+
+def start_warming(generate_fn) -> asyncio.Task:
+    """
+    Single-flight background warm-up.
+    """
+    global _warm_task
+
+    if _warm_task is None or _warm_task.done():
+        _warm_task = asyncio.create_task(warm_pools(generate_fn), name="mock-warm")
+    return _warm_task
+
+
+async def missing(plan: dict = None) -> dict:
+    """
+    {subject: questions short} for one paper; empty when it can be met.
+    """
+    plan = plan or blueprint()
+    depths = await asyncio.gather(*(buffer.depth(subject) for subject in plan))
+    return {
+        subject: count - ready
+        for (subject, count), ready in zip(plan.items(), depths)
+        if ready < count
+    }
+
+
+# ================= PAPERS =================
+# Papers live in the attempt store, so any worker can serve or score them
+
+
+def public_paper(paper: dict) -> dict:
+    # Answers and explanations stay on the server until submission
+    return {
+        "paper_id": paper["paper_id"],
+        "created_at": paper["created_at"],
+        "duration_minutes": MOCK_TEST_MINUTES,
+        "ends_at": paper["created_at"] + MOCK_TEST_MINUTES * 60,
+        "blueprint": paper["blueprint"],
+        "shortfall": paper["shortfall"],
+        "questions": [
+            {
+                "index": i,
+                "id": q.get("id"),
+                "subject": q["subject"],
+                "question": q["question"],
+                "options": q["options"],
+                "difficulty": q.get("difficulty")
+            }
+            for i, q in enumerate(paper["questions"])
+        ]
+    }
+
+
+async def assemble(generate_fn) -> dict:
+    """
+    Builds a paper from what is already buffered; never waits on the LLM.
+    Raises PoolsWarming (and starts warming) while the blueprint cannot
+    be met, unless short papers are allowed; those report "shortfall".
+    """
+    await asyncio.to_thread(storage.purge_mock_papers, time.time() - MOCK_PAPER_TTL_SECONDS)
+
+    plan = blueprint()
+    short = await missing(plan)
+    if short and not MOCK_ALLOW_SHORT_PAPERS:
+        start_warming(generate_fn)
+        raise PoolsWarming(short)
+
+    drawn = await asyncio.gather(*(
+        buffer.take_ready(subject, count) for subject, count in plan.items()
+    ))
+
+    questions = []
+    shortfall = {}
+    for (subject, count), items in zip(plan.items(), drawn):
+        for item in items:
+            questions.append({**item, "subject": subject})
+        if len(items) < count:
+            shortfall[subject] = count - len(items)
+
+    paper = {
+        "paper_id": uuid.uuid4().hex,
+        "created_at": time.time(),
+        "blueprint": plan,
+        "shortfall": shortfall,
+        "questions": questions,
+        "submitted": None
+    }
+    if questions:
+        await asyncio.to_thread(storage.save_mock_paper, paper)
+
+    MOCK_STATS["papers"] += 1
+    if shortfall:
+        MOCK_STATS["short_papers"] += 1
+
+    # Replace what this paper used
+    start_warming(generate_fn)
+
+    return paper
+
+
+def get(paper_id: str):
+    paper = storage.get_mock_paper(paper_id)
+    if paper is None or time.time() - paper["created_at"] > MOCK_PAPER_TTL_SECONDS:
+        return None
+    return paper
+
+
+def parse_answers(paper: dict, answers: dict) -> dict:
+    """
+    {"<question index>": option} from the client as {int: int}.
+    Raises ValueError for indexes outside the paper or options outside 0-3.
+    """
+    try:
+        selected = {int(index): int(option) for index, option in answers.items()}
+    except (TypeError, ValueError):
+        raise ValueError("Answers must map question index to option index")
+
+    total = len(paper["questions"])
+    for index, option in selected.items():
+        if not 0 <= index < total:
+            raise ValueError(f"Question index {index} is outside the paper (0-{total - 1})")
+        if not 0 <= option <= 3:
+            raise ValueError(f"Option for question {index} must be 0-3")
+
+    return selected
+
+
+def score(paper: dict, answers: dict) -> dict:
+    """
+    Scores a whole paper in one pass and saves answered questions as
+    attempts in one transaction.
+    answers: {question index: selected option}
+    Only the first submission counts, across retries and workers.
+    """
+    if paper["submitted"] is not None:
+        return paper["submitted"]
+
+    result, attempts = _score(paper, answers)
+    if not storage.finish_mock_paper(paper["paper_id"], result):
+        return storage.get_mock_paper(paper["paper_id"])["submitted"]
+
+    storage.save_questions(attempts)
+    MOCK_STATS["submitted"] += 1
+    return result
+
+
+def _score(paper: dict, answers: dict):
+    now = time.time()
+    by_subject = {}
+    review = []
+    attempts = []
+    marks = 0.0
+
+    for i, q in enumerate(paper["questions"]):
+        selected = answers.get(i)
+        stats = by_subject.setdefault(q["subject"], {"correct": 0, "wrong": 0, "unanswered": 0})
+
+        if selected is None:
+            result = "Unanswered"
+            stats["unanswered"] += 1
+        elif selected == q["correct_option"]:
+            result = "Correct"
+            stats["correct"] += 1
+            marks += 1
+        else:
+            result = "Wrong"
+            stats["wrong"] += 1
+            marks -= MOCK_NEGATIVE_MARK
+
+        review.append({
+            "index": i,
+            "selected_option": selected,
+            "correct_option": q["correct_option"],
+            "explanation": q.get("explanation"),
+            "result": result
+        })
+
+        if selected is not None:
+            attempts.append({
+                "question": q["question"],
+                "options": q["options"],
+                "selected_option": selected,
+                "correct_option": q["correct_option"],
+                "explanation": q.get("explanation"),
+                "subject": q["subject"],
+                "result": result,
+                "mock_paper": paper["paper_id"]
+            })
+
+    answered = len(attempts)
+    correct = sum(stats["correct"] for stats in by_subject.values())
+    result = {
+        "paper_id": paper["paper_id"],
+        "submitted_at": now,
+        "late": now > paper["created_at"] + MOCK_TEST_MINUTES * 60,
+        "total": len(paper["questions"]),
+        "answered": answered,
+        "correct": correct,
+        "marks": round(marks, 2),
+        "accuracy": round(correct / answered, 3) if answered else 0.0,
+        "subjects": by_subject,
+        "review": review
+    }
+
+    return result, attempts
+
+
+def stats() -> dict:
+    open_papers = storage.count_open_mock_papers(time.time() - MOCK_PAPER_TTL_SECONDS)
+    return {**MOCK_STATS, "open_papers": open_papers}
@@ -0,0 +1,141 @@
+import glob
+import hashlib
+import os
+import tempfile
+
+import storage
+from pdf_generator import render_chunk
+
+CACHE_DIR = os.path.join(storage.DATA_DIR, "pdf_cache")
+
+# Attempts per rendered chunk; a new attempt re-renders only the tail chunk
+PDF_CHUNK_SIZE = int(os.getenv("PDF_CHUNK_SIZE", "50"))
+
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+
+def _scope_key(subject: str = None) -> str:
+    scope = "all" if subject is None else f"subject:{subject}"
+    return hashlib.sha1(scope.encode()).hexdigest()[:12]
+
+
+def _etag(subject: str, last_id: int) -> str:
+    # The store is append-only: the newest id in scope pins its contents
+    raw = f"{storage.store_id()}:{_scope_key(subject)}:{last_id}:{PDF_CHUNK_SIZE}"
+    return '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+
+def pdf_etag(subject: str = None) -> str:
+    """
+    Strong ETag of the PDF for a scope, without rendering anything.
+    One index lookup, cheap enough for the event loop.
+    """
+    return _etag(subject, storage.last_attempt_id(subject))
+
+
+def _atomic_render(questions: list, path: str, start: int, empty_message: str):
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    os.close(fd)
+    try:
+        render_chunk(questions, tmp_path, start=start, empty_message=empty_message)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _remove_stale(pattern: str, keep: set):
+    for path in glob.glob(os.path.join(CACHE_DIR, pattern)):
+        if path not in keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _open_chunk(subject: str, path: str, offset: int, size: int, empty_message: str):
+    """
+    Opens a chunk, rendering it first if needed. An export of a newer
+    version may remove an old tail at any time; an open handle keeps it
+    readable, and a tail removed before opening is simply rendered again.
+    """
+    for _ in range(3):
+        if not os.path.exists(path):
+            questions = storage.load_attempts(subject, offset, size)
+            _atomic_render(questions, path, offset + 1, empty_message)
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            continue
+
+    raise RuntimeError(f"PDF chunk {path} kept disappearing")
+
+
+def build_pdf(subject: str = None):
+    """
+    Returns (pdf_path, etag) for all attempts or one subject.
+
+    Full chunks never change (the store is append-only), so they are
+    rendered once and reused; only the tail chunk is re-rendered before
+    the chunks are concatenated.
+    """
+    count, last_id = storage.attempt_version(subject)
+    etag = _etag(subject, last_id)
+    scope = _scope_key(subject)
+    prefix = f"{storage.store_id()[:8]}-{scope}"
+    final_path = os.path.join(CACHE_DIR, f"{prefix}-{etag.strip(chr(34))}.pdf")
+
+    if os.path.exists(final_path):
+        return final_path, etag
+
+    empty_message = (
+        "No questions attempted yet. Start practicing to generate your PDF."
+        if subject is None
+        else f"No attempted questions for subject: {subject}"
+    )
+
+    chunks = []
+    for idx in range(max(1, -(-count // PDF_CHUNK_SIZE))):
+        offset = idx * PDF_CHUNK_SIZE
+        size = min(PDF_CHUNK_SIZE, count - offset)
+
+        # Full chunks are keyed by position only, the tail by its size too
+        if size == PDF_CHUNK_SIZE:
+            path = os.path.join(CACHE_DIR, f"{prefix}-n{PDF_CHUNK_SIZE}-c{idx}.pdf")
+        else:
+            path = os.path.join(CACHE_DIR, f"{prefix}-n{PDF_CHUNK_SIZE}-c{idx}-tail{size}.pdf")
+
+        chunks.append((path, offset, size))
+
+    from pypdf import PdfWriter  # first export only
+
+    writer = PdfWriter()
+    handles = []
+    try:
+        for path, offset, size in chunks:
+            handles.append(_open_chunk(subject, path, offset, size, empty_message))
+            writer.append(handles[-1])
+
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            writer.write(f)
+        os.replace(tmp_path, final_path)
+    finally:
+        for handle in handles:
+            handle.close()
+
+    # Older tails and finals for this scope are no longer reachable
+    _remove_stale(f"{prefix}-n*-c*-tail*.pdf", {path for path, _, _ in chunks})
+    _remove_stale(f"{prefix}-????????????????????.pdf", {final_path})
+
+    return final_path, etag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
@@ -1,87 +1,47 @@
-import os
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
+# reportlab is imported on first render: most processes never draw a PDF
+# pdf_cache picks the output path: a fresh temp file per render
 
-OUTPUT_DIR = "data"
-OUTPUT_PDF = os.path.join(OUTPUT_DIR, "BEL_PE_All_Practice_Questions.pdf")
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+def _add_questions(story: list, questions: list, styles, start: int = 1):
+    from reportlab.platypus import Paragraph, Spacer
 
+    for i, q in enumerate(questions, start=start):
+        story.append(Paragraph(f"<b>Q{i}. {q['question']}</b>", styles["Normal"]))
+        story.append(Spacer(1, 6))
 
-def generate_pdf(questions: list):
-    styles = getSampleStyleSheet()
-    story = []
+        for idx, opt in enumerate(q["options"]):
+            story.append(Paragraph(f"{chr(65+idx)}. {opt}", styles["Normal"]))
 
-    if not questions:
-        story.append(
-            Paragraph(
-                "<b>No questions attempted yet.</b><br/>"
-                "Start practicing to generate your PDF.",
-                styles["Normal"]
-            )
-        )
-    else:
-        for i, q in enumerate(questions, start=1):
-            story.append(Paragraph(f"<b>Q{i}. {q['question']}</b>", styles["Normal"]))
-            story.append(Spacer(1, 6))
+        story.append(Spacer(1, 6))
+        story.append(Paragraph(
+            f"<b>Correct Answer:</b> {chr(65 + q['correct_option'])}",
+            styles["Normal"]
+        ))
+        story.append(Paragraph(
+            f"<b>Explanation:</b> {q['explanation']}",
+            styles["Normal"]
+        ))
+        story.append(Spacer(1, 12))
 
-            for idx, opt in enumerate(q["options"]):
-                story.append(Paragraph(f"{chr(65+idx)}. {opt}", styles["Normal"]))
-
-            story.append(Spacer(1, 6))
-            story.append(Paragraph(
-                f"<b>Correct Answer:</b> {chr(65 + q['correct_option'])}",
-                styles["Normal"]
-            ))
-            story.append(Paragraph(
-                f"<b>Explanation:</b> {q['explanation']}",
-                styles["Normal"]
-            ))
-            story.append(Spacer(1, 12))
-
-    doc = SimpleDocTemplate(OUTPUT_PDF, pagesize=A4)
-    doc.build(story)
 
-    return OUTPUT_PDF
+def render_chunk(questions: list, pdf_path: str, start: int = 1, empty_message: str = None):
+    """
+    Renders one slice of attempts, numbered from `start`.
+    Chunks are concatenated by pdf_cache.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate
 
-def generate_subject_pdf(questions: list, subject: str):
     styles = getSampleStyleSheet()
     story = []
 
-    filtered = [q for q in questions if q["subject"] == subject]
-
-    if not filtered:
-        story.append(
-            Paragraph(
-                f"<b>No attempted questions for subject: {subject}</b>",
-                styles["Normal"]
-            )
-        )
+    if not questions:
+        story.append(Paragraph(f"<b>{empty_message}</b>", styles["Normal"]))
     else:
-        for i, q in enumerate(filtered, start=1):
-            story.append(Paragraph(f"<b>Q{i}. {q['question']}</b>", styles["Normal"]))
-            story.append(Spacer(1, 6))
-
-            for idx, opt in enumerate(q["options"]):
-                story.append(Paragraph(f"{chr(65+idx)}. {opt}", styles["Normal"]))
-
-            story.append(Spacer(1, 6))
-            story.append(Paragraph(
-                f"<b>Correct Answer:</b> {chr(65 + q['correct_option'])}",
-                styles["Normal"]
-            ))
-            story.append(Paragraph(
-                f"<b>Explanation:</b> {q['explanation']}",
-                styles["Normal"]
-            ))
-            story.append(Spacer(1, 12))
-
-    filename = f"BEL_PE_{subject.replace(' ', '_')}.pdf"
-    pdf_path = os.path.join(OUTPUT_DIR, filename)
+        _add_questions(story, questions, styles, start=start)
 
     doc = SimpleDocTemplate(pdf_path, pagesize=A4)
     doc.build(story)
 
     return pdf_path
-
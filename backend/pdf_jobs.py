@@ -0,0 +1,176 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+import pdf_cache
+import storage
+
+# PDF rendering runs in worker processes, never in the API threadpool
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", "8"))
+
+# Finished jobs (and their files) are kept this long
+PDF_JOB_TTL_SECONDS = float(os.getenv("PDF_JOB_TTL_SECONDS", "600"))
+
+JOB_DIR = os.path.join(storage.DATA_DIR, "pdf_jobs")
+os.makedirs(JOB_DIR, exist_ok=True)
+
+
+class PdfQueueFull(Exception):
+    pass
+
+
+class PdfJob:
+    def __init__(self, subject, etag: str):
+        self.id = uuid.uuid4().hex
+        self.subject = subject
+        self.etag = etag
+        self.status = "pending"
+        self.path = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "subject": self.subject,
+            "status": self.status,
+            "etag": self.etag,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+
+JOBS = {}
+
+# (subject, etag) -> job, so identical in-flight exports render once
+IN_FLIGHT = {}
+
+_executor = None
+
+
+def _render(subject, job_id: str):
+    """
+    Runs in a worker process.
+    The cached PDF is linked to a per-job file, so later cache cleanup
+    never pulls a file out from under a running download.
+    """
+    job_path = os.path.join(JOB_DIR, f"{job_id}.pdf")
+
+    # A concurrent export of a newer version may remove this final
+    # before it is linked; building again re-creates it
+    for _ in range(3):
+        path, etag = pdf_cache.build_pdf(subject)
+        try:
+            os.link(path, job_path)
+            return job_path, etag
+        except FileNotFoundError:
+            continue
+        except OSError:
+            try:
+                shutil.copyfile(path, job_path)
+                return job_path, etag
+            except FileNotFoundError:
+                continue
+
+    raise RuntimeError("PDF was replaced while exporting, try again")
+
+
+def start():
+    global _executor
+
+    if _executor is None:
+        # spawn: workers must not inherit the writer thread or sqlite handles
+        _executor = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+
+def shutdown():
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _purge_expired():
+    now = time.time()
+    for job_id, job in list(JOBS.items()):
+        if job.finished_at and now - job.finished_at > PDF_JOB_TTL_SECONDS:
+            del JOBS[job_id]
+            if job.path and os.path.exists(job.path):
+                os.remove(job.path)
+
+
+def _finish(job: PdfJob, future: asyncio.Future):
+    IN_FLIGHT.pop((job.subject, job.etag), None)
+    job.finished_at = time.time()
+
+    if future.cancelled():
+        job.status, job.error = "failed", "cancelled"
+    elif future.exception() is not None:
+        job.status, job.error = "failed", str(future.exception())
+    else:
+        job.path, job.etag = future.result()
+        job.status = "done"
+
+    metrics.PDF_JOB_SECONDS.observe(job.finished_at - job.created_at, job.status)
+
+
+def submit(subject: str = None) -> PdfJob:
+    """
+    Queues a PDF export for all attempts (subject=None) or one subject.
+    Returns the already running job when an identical one is in flight.
+    """
+    start()
+    _purge_expired()
+
+    etag = pdf_cache.pdf_etag(subject)
+    job = IN_FLIGHT.get((subject, etag))
+    if job is not None:
+        return job
+
+    if len(IN_FLIGHT) >= PDF_MAX_PENDING:
+        raise PdfQueueFull("Too many PDF exports in progress, try again shortly")
+
+    job = PdfJob(subject, etag)
+    loop = asyncio.get_running_loop()
+    job.future = loop.run_in_executor(_executor, _render, subject, job.id)
+    job.future.add_done_callback(lambda future: _finish(job, future))
+
+    JOBS[job.id] = job
+    IN_FLIGHT[(subject, etag)] = job
+    return job
+
+
+def get(job_id: str):
+    return JOBS.get(job_id)
+
+
+async def wait(job: PdfJob, timeout: float = None) -> PdfJob:
+    """
+    Waits for a job without cancelling it on timeout.
+    """
+    if job.status == "pending":
+        try:
+            await asyncio.wait_for(asyncio.shield(job.future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except Exception:
+            # Recorded on the job by _finish
+            pass
+
+        # Let the done callback run
+        await asyncio.sleep(0)
+
+    return job
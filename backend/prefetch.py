@@ -0,0 +1,149 @@
+import math
+import os
+import time
+from collections import deque
+
+# Starting watermarks before any demand is observed
+DEFAULT_LOW_WATER = 5
+DEFAULT_HIGH_WATER = 20
+
+# Bounds for the adaptive watermarks
+MIN_LOW_WATER = 2
+MAX_HIGH_WATER = int(os.getenv("PREFETCH_MAX_HIGH_WATER", "60"))
+
+# Questions produced by one generation
+BATCH_SIZE = 10
+
+# Headroom on top of "questions consumed while a refill is in flight"
+SAFETY_FACTOR = float(os.getenv("PREFETCH_SAFETY_FACTOR", "1.5"))
+
+# Assumed LLM latency until one has been measured (seconds)
+DEFAULT_LLM_LATENCY = 60.0
+
+# No serve for this long -> subject goes cold (no background refills)
+IDLE_SECONDS = float(os.getenv("PREFETCH_IDLE_SECONDS", "900"))
+
+# Smoothing for gap / latency averages
+EWMA_ALPHA = 0.3
+
+
+class SubjectDemand:
+    def __init__(self):
+        self.last_served = None
+        self.avg_gap = None
+        self.llm_latency = None
+        self.low_water = DEFAULT_LOW_WATER
+        self.high_water = DEFAULT_HIGH_WATER
+        self.served = 0
+        self.dry_runs = 0
+        self.refills = 0
+        self.skipped_cold = 0
+
+
+DEMAND = {}
+
+# Recent controller decisions, newest last
+DECISIONS = deque(maxlen=100)
+
+
+def _demand(subject: str) -> SubjectDemand:
+    if subject not in DEMAND:
+        DEMAND[subject] = SubjectDemand()
+    return DEMAND[subject]
+
+
+def _ewma(old, value):
+    return value if old is None else EWMA_ALPHA * value + (1 - EWMA_ALPHA) * old
+
+
+def _decide(subject: str, action: str, **details):
+    DECISIONS.append({"at": time.time(), "subject": subject, "action": action, **details})
+
+
+def _retune(subject: str, d: SubjectDemand):
+    if d.avg_gap is None:
+        return
+
+    rate = 1.0 / d.avg_gap
+    latency = d.llm_latency or DEFAULT_LLM_LATENCY
+
+    # Enough stock to cover consumption while one refill is in flight
+    low = math.ceil(rate * latency * SAFETY_FACTOR)
+    low = max(MIN_LOW_WATER, min(low, MAX_HIGH_WATER - BATCH_SIZE))
+    high = min(low + BATCH_SIZE, MAX_HIGH_WATER)
+
+    if (low, high) != (d.low_water, d.high_water):
+        d.low_water, d.high_water = low, high
+        _decide(subject, "retune", low_water=low, high_water=high,
+                rate_per_min=round(rate * 60, 2), llm_latency_s=round(latency, 1))
+
+
+# ================= SIGNALS =================
+def record_serve(subject: str, depth: int):
+    """
+    Called for every served question with the buffer depth on arrival.
+    """
+    d = _demand(subject)
+    now = time.monotonic()
+
+    if d.last_served is not None:
+        gap = min(max(now - d.last_served, 0.05), IDLE_SECONDS)
+        d.avg_gap = _ewma(d.avg_gap, gap)
+
+    d.last_served = now
+    d.served += 1
+    if depth == 0:
+        d.dry_runs += 1
+
+    _retune(subject, d)
+
+
+def record_generation(subject: str, seconds: float):
+    d = _demand(subject)
+    d.llm_latency = _ewma(d.llm_latency, seconds)
+    _retune(subject, d)
+
+
+# ================= DECISIONS =================
+def is_cold(subject: str) -> bool:
+    d = _demand(subject)
+    return d.last_served is None or time.monotonic() - d.last_served > IDLE_SECONDS
+
+
+def high_water(subject: str) -> int:
+    return _demand(subject).high_water
+
+
+def should_refill(subject: str, depth: int) -> bool:
+    d = _demand(subject)
+
+    if depth > d.low_water:
+        return False
+
+    if is_cold(subject):
+        d.skipped_cold += 1
+        _decide(subject, "skip_cold", depth=depth)
+        return False
+
+    d.refills += 1
+    _decide(subject, "refill", depth=depth, target=d.high_water)
+    return True
+
+
+def status() -> dict:
+    subjects = {}
+    for subject, d in DEMAND.items():
+        subjects[subject] = {
+            "low_water": d.low_water,
+            "high_water": d.high_water,
+            "rate_per_min": round(60.0 / d.avg_gap, 2) if d.avg_gap else 0.0,
+            "llm_latency_s": round(d.llm_latency, 2) if d.llm_latency else None,
+            "cold": is_cold(subject),
+            "served": d.served,
+            "dry_runs": d.dry_runs,
+            "dry_rate": round(d.dry_runs / d.served, 3) if d.served else 0.0,
+            "refills": d.refills,
+            "skipped_cold": d.skipped_cold
+        }
+
+    return {"subjects": subjects, "decisions": list(DECISIONS)[-20:]}
@@ -0,0 +1,188 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import storage
+
+# Write-through copy of every buffered question
+POOL_DB_FILE = os.path.join(storage.DATA_DIR, "question_pool.db")
+QUESTION_POOL = os.getenv("QUESTION_POOL", "1") == "1"
+
+# Served rows are kept this long, then pruned at startup
+SERVED_RETENTION_SECONDS = 7 * 24 * 3600
+
+# One connection per thread: `with conn:` commits and rollbacks of
+# different threads must never share a transaction. Callers on the
+# event loop go through asyncio.to_thread (lock waits block a thread)
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+
+
+def _db():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        # check_same_thread=False only so close() can run at shutdown
+        conn = sqlite3.connect(POOL_DB_FILE, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Commits survive a process crash; no fsync per claim
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                subject TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                served_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_pool_unserved
+                ON pool (subject, id) WHERE served_at IS NULL;
+            CREATE TABLE IF NOT EXISTS refill_leases (
+                subject TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+        """)
+        conn.commit()
+
+        _local.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
+
+    return conn
+
+
+def add(subject: str, question: dict):
+    """
+    Persists a freshly generated question, returns its pool id.
+    """
+    if not QUESTION_POOL:
+        return None
+
+    conn = _db()
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO pool (subject, data, created_at) VALUES (?, ?, ?)",
+            (subject, json.dumps(question, ensure_ascii=False), time.time())
+        )
+    return cursor.lastrowid
+
+
+def claim(pool_id) -> bool:
+    """
+    Atomically marks a question as served.
+    False means it was already served (e.g. before a crash).
+    """
+    if not QUESTION_POOL or pool_id is None:
+        return True
+
+    conn = _db()
+    with conn:
+        cursor = conn.execute(
+            "UPDATE pool SET served_at = ? WHERE id = ? AND served_at IS NULL",
+            (time.time(), pool_id)
+        )
+    return cursor.rowcount == 1
+
+
+def load_unserved() -> dict:
+    """
+    Returns {subject: [(pool_id, question), ...]} in generation order.
+    """
+    if not QUESTION_POOL:
+        return {}
+
+    conn = _db()
+    with conn:
+        conn.execute(
+            "DELETE FROM pool WHERE served_at IS NOT NULL AND served_at < ?",
+            (time.time() - SERVED_RETENTION_SECONDS,)
+        )
+
+    pending = {}
+    rows = conn.execute(
+        "SELECT id, subject, data FROM pool WHERE served_at IS NULL ORDER BY id"
+    ).fetchall()
+    for pool_id, subject, data in rows:
+        pending.setdefault(subject, []).append((pool_id, json.loads(data)))
+
+    return pending
+
+
+# ================= SHARED POOL (MULTI-WORKER) =================
+def claim_next(subject: str):
+    """
+    Atomically claims the oldest unserved question of a subject.
+    Safe across processes: the UPDATE runs under SQLite's write lock.
+    """
+    conn = _db()
+    with conn:
+        row = conn.execute(
+            """
+            UPDATE pool SET served_at = ?
+            WHERE id = (
+                SELECT id FROM pool
+                WHERE subject = ? AND served_at IS NULL
+                ORDER BY id LIMIT 1
+            )
+            RETURNING data
+            """,
+            (time.time(), subject)
+        ).fetchone()
+
+    return json.loads(row[0]) if row else None
+
+
+def count_unserved(subject: str) -> int:
+    row = _db().execute(
+        "SELECT COUNT(*) FROM pool WHERE subject = ? AND served_at IS NULL",
+        (subject,)
+    ).fetchone()
+    return row[0]
+
+
+def acquire_lease(subject: str, owner: str, ttl: float) -> bool:
+    """
+    Takes (or renews) a lease: a subject's refill, or another named
+    job such as Docs sync. Only one worker holds an unexpired lease.
+    """
+    now = time.time()
+    conn = _db()
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO refill_leases (subject, owner, expires_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT (subject) DO UPDATE
+                SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE refill_leases.owner = excluded.owner
+                   OR refill_leases.expires_at < ?
+            """,
+            (subject, owner, now + ttl, now)
+        )
+        row = conn.execute(
+            "SELECT owner FROM refill_leases WHERE subject = ?", (subject,)
+        ).fetchone()
+
+    return row is not None and row[0] == owner
+
+
+def release_lease(subject: str, owner: str):
+    conn = _db()
+    with conn:
+        conn.execute(
+            "DELETE FROM refill_leases WHERE subject = ? AND owner = ?",
+            (subject, owner)
+        )
+
+
+def close():
+    global _local
+
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+    _local = threading.local()
@@ -0,0 +1,361 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+
+import httpx
+
+# ================= CONFIG =================
+# Hedging: a second identical request once the first passes the p95
+LLM_HEDGE = os.getenv("LLM_HEDGE", "1") == "1"
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "5"))
+# Used until enough latencies have been observed
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "90"))
+LATENCY_SAMPLES = 200
+MIN_SAMPLES = 20
+
+# Retries: jittered exponential backoff, capped by a budget so a failing
+# backend does not get multiplied traffic
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BACKOFF_BASE = float(os.getenv("LLM_RETRY_BACKOFF_BASE", "1.0"))
+LLM_RETRY_BUDGET_RATIO = float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MAX = 10.0
+
+# Circuit breaker: open after N consecutive failures, probe after cooldown
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# LLM failures; of these, client errors other than 429 are not retried
+FAILURES = (httpx.TransportError, httpx.HTTPStatusError, asyncio.TimeoutError, ValueError)
+
+RESILIENCE_STATS = {
+    "calls": 0, "failures": 0, "retries": 0, "retries_denied": 0,
+    "hedges": 0, "hedge_wins": 0, "rejected_open": 0
+}
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+# ================= LATENCY =================
+class LatencyTracker:
+    def __init__(self):
+        self._samples = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float):
+        if len(self._samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def hedge_delay(self) -> float:
+        p95 = self.percentile(0.95)
+        if p95 is None:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, p95)
+
+
+# ================= RETRY BUDGET =================
+class RetryBudget:
+    """
+    Every call earns a fraction of a retry token; every retry (or hedge)
+    spends one. Starts full so isolated failures are always retried.
+    """
+
+    def __init__(self):
+        self.tokens = RETRY_BUDGET_MAX
+
+    def deposit(self):
+        self.tokens = min(RETRY_BUDGET_MAX, self.tokens + LLM_RETRY_BUDGET_RATIO)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+# ================= CIRCUIT BREAKER =================
+class CircuitBreaker:
+    def __init__(self):
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+
+        if self.state == "open" and time.monotonic() - self.opened_at >= LLM_BREAKER_COOLDOWN:
+            self.state = "half_open"
+
+        # Half open: a single probe at a time
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+
+        return False
+
+    def record_success(self):
+        if self.state != "closed":
+            print("✅ LLM circuit closed")
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+
+        if self.state == "half_open" or self.failures >= LLM_BREAKER_THRESHOLD:
+            if self.state != "open":
+                print(f"⚠️ LLM circuit open for {LLM_BREAKER_COOLDOWN:.0f}s after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def abandon(self):
+        # A cancelled probe proves nothing either way
+        self._probing = False
+
+    def retry_after(self) -> float:
+        return max(0.0, LLM_BREAKER_COOLDOWN - (time.monotonic() - self.opened_at))
+
+
+LATENCY = LatencyTracker()
+# Streams are hedged on time to the first question, not the full batch
+FIRST_QUESTION_LATENCY = LatencyTracker()
+BUDGET = RetryBudget()
+BREAKER = CircuitBreaker()
+
+
+def _check_breaker():
+    if not BREAKER.allow():
+        RESILIENCE_STATS["rejected_open"] += 1
+        raise CircuitOpen(f"LLM unavailable, retry in {BREAKER.retry_after():.0f}s")
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return True
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter
+    return random.uniform(0, LLM_RETRY_BACKOFF_BASE * (2 ** attempt))
+
+
+async def _hedged(fn, *args):
+    """
+    Runs fn; if it has not finished by the observed p95, starts an
+    identical second call and returns whichever succeeds first.
+    """
+    first = asyncio.ensure_future(fn(*args))
+    if not LLM_HEDGE or BREAKER.state != "closed":
+        return await first
+
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=LATENCY.hedge_delay())
+        if done or not BUDGET.withdraw():
+            return await first
+
+        RESILIENCE_STATS["hedges"] += 1
+        tasks.append(asyncio.ensure_future(fn(*args)))
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        RESILIENCE_STATS["hedge_wins"] += 1
+                    return task.result()
+
+        # Both failed: report the original error
+        return first.result()
+    finally:
+        # The loser, or both when the caller is cancelled
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def _pump(stream, index: int, queue: asyncio.Queue):
+    # Drains one stream inside a single task, so deadlines the generator
+    # opens (asyncio.timeout) stay bound to the task that iterates it
+    try:
+        async for question in stream:
+            queue.put_nowait((index, "question", question))
+        queue.put_nowait((index, "end", None))
+    except Exception as exc:
+        queue.put_nowait((index, "error", exc))
+    finally:
+        await stream.aclose()
+
+
+async def _hedged_stream(fn, *args):
+    """
+    Streaming hedge: if no question has arrived by the observed p95
+    time to first question, a second identical stream is started and
+    whichever yields first is kept; the other is cancelled.
+    """
+    queue = asyncio.Queue()
+    pumps = [asyncio.ensure_future(_pump(fn(*args), 0, queue))]
+    first = asyncio.ensure_future(queue.get())
+    try:
+        if LLM_HEDGE and BREAKER.state == "closed":
+            done, _ = await asyncio.wait([first], timeout=FIRST_QUESTION_LATENCY.hedge_delay())
+            if not done and BUDGET.withdraw():
+                RESILIENCE_STATS["hedges"] += 1
+                pumps.append(asyncio.ensure_future(_pump(fn(*args), 1, queue)))
+
+        index, kind, value = await first
+        errors = {}
+        while kind == "error":
+            errors[index] = value
+            if len(errors) == len(pumps):
+                # Both failed: report the original error
+                raise errors[0]
+            index, kind, value = await queue.get()
+
+        winner = index
+        if winner:
+            RESILIENCE_STATS["hedge_wins"] += 1
+        for i, pump in enumerate(pumps):
+            if i != winner:
+                pump.cancel()
+
+        while kind == "question":
+            yield value
+            index, kind, value = await queue.get()
+            while index != winner:
+                index, kind, value = await queue.get()
+
+        if kind == "error":
+            raise value
+    finally:
+        # The loser, or everything when the caller stops early
+        first.cancel()
+        for pump in pumps:
+            pump.cancel()
+        await asyncio.gather(*pumps, return_exceptions=True)
+
+
+def resilient(fn):
+    """
+    Wraps a coroutine LLM call (generate_mcqs / generate_mcqs_batch)
+    with the circuit breaker, hedging and budgeted retries.
+    """
+    async def call(*args):
+        RESILIENCE_STATS["calls"] += 1
+        BUDGET.deposit()
+
+        attempt = 0
+        while True:
+            _check_breaker()
+            started = time.monotonic()
+            try:
+                result = await _hedged(fn, *args)
+            except asyncio.CancelledError:
+                BREAKER.abandon()
+                raise
+            except FAILURES as exc:
+                RESILIENCE_STATS["failures"] += 1
+                BREAKER.record_failure()
+                if attempt >= LLM_RETRIES or BREAKER.state == "open" or not _retryable(exc):
+                    raise
+                if not BUDGET.withdraw():
+                    RESILIENCE_STATS["retries_denied"] += 1
+                    raise
+
+                delay = _backoff(attempt)
+                print(f"⚠️ LLM call failed ({exc!r}), retry {attempt + 1} in {delay:.1f}s")
+                RESILIENCE_STATS["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                # Unexpected errors (e.g. a malformed response) are failures
+                # too, never retried; recording them also frees a probe slot
+                RESILIENCE_STATS["failures"] += 1
+                BREAKER.record_failure()
+                raise
+
+            LATENCY.record(time.monotonic() - started)
+            BREAKER.record_success()
+            return result
+
+    return call
+
+
+def resilient_stream(fn):
+    """
+    Streaming variant: breaker, hedging before the first question and
+    budgeted retries. A failed stream is only retried before its first
+    question.
+    """
+    async def generate(*args):
+        RESILIENCE_STATS["calls"] += 1
+        BUDGET.deposit()
+
+        attempt = 0
+        while True:
+            _check_breaker()
+            started = time.monotonic()
+            yielded = 0
+            try:
+                async for question in _hedged_stream(fn, *args):
+                    if not yielded:
+                        FIRST_QUESTION_LATENCY.record(time.monotonic() - started)
+                    yielded += 1
+                    yield question
+            except (asyncio.CancelledError, GeneratorExit):
+                BREAKER.abandon()
+                raise
+            except FAILURES as exc:
+                RESILIENCE_STATS["failures"] += 1
+                BREAKER.record_failure()
+                if yielded or attempt >= LLM_RETRIES or BREAKER.state == "open" or not _retryable(exc):
+                    raise
+                if not BUDGET.withdraw():
+                    RESILIENCE_STATS["retries_denied"] += 1
+                    raise
+
+                delay = _backoff(attempt)
+                print(f"⚠️ LLM stream failed ({exc!r}), retry {attempt + 1} in {delay:.1f}s")
+                RESILIENCE_STATS["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                RESILIENCE_STATS["failures"] += 1
+                BREAKER.record_failure()
+                raise
+
+            LATENCY.record(time.monotonic() - started)
+            BREAKER.record_success()
+            return
+
+    return generate
+
+
+def status() -> dict:
+    p50, p95 = LATENCY.percentile(0.5), LATENCY.percentile(0.95)
+    return {
+        "breaker": BREAKER.state,
+        "consecutive_failures": BREAKER.failures,
+        "retry_budget": round(BUDGET.tokens, 2),
+        "latency_p50_s": round(p50, 2) if p50 is not None else None,
+        "latency_p95_s": round(p95, 2) if p95 is not None else None,
+        "hedge_delay_s": round(LATENCY.hedge_delay(), 2),
+        "stream_hedge_delay_s": round(FIRST_QUESTION_LATENCY.hedge_delay(), 2),
+        **RESILIENCE_STATS
+    }
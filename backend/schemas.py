@@ -1,15 +1,104 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+from typing import List, Optional
 
 
 class MCQ(BaseModel):
     question: str
     options: List[str]
     correct_option: int
+    explanation: str
     subject: str
-    difficulty: str
+    difficulty: str = "Moderate"
+
+    @field_validator("question", "explanation")
+    @classmethod
+    def not_blank(cls, value: str) -> str:
+        value = value.strip()
+        if not value:
+            raise ValueError("must not be empty")
+        return value
+
+    @field_validator("options")
+    @classmethod
+    def four_options(cls, value: List[str]) -> List[str]:
+        value = [option.strip() for option in value]
+        if len(value) != 4 or not all(value):
+            raise ValueError("exactly 4 non-empty options required")
+        if len(set(value)) != 4:
+            raise ValueError("options must be distinct")
+        return value
+
+    @field_validator("correct_option")
+    @classmethod
+    def option_in_range(cls, value: int) -> int:
+        if not 0 <= value <= 3:
+            raise ValueError("correct_option must be 0-3")
+        return value
 
 
 class AnswerSubmission(BaseModel):
     selected_option: int
     correct_option: int
+
+
+def _option_index(value: int) -> int:
+    if not 0 <= value <= 3:
+        raise ValueError("option must be 0-3")
+    return value
+
+
+class AttemptSubmission(BaseModel):
+    # An answer to a question the backend already stores
+    question_id: str
+    selected_option: int
+    session: Optional[str] = None
+
+    @field_validator("question_id")
+    @classmethod
+    def id_not_blank(cls, value: str) -> str:
+        if not value.strip():
+            raise ValueError("must not be empty")
+        return value
+
+    @field_validator("selected_option")
+    @classmethod
+    def option_in_range(cls, value: int) -> int:
+        return _option_index(value)
+
+
+class FullAttempt(BaseModel):
+    # Legacy attempt carrying its own question; other fields
+    # (subject, explanation, result, ...) are kept as sent
+    model_config = ConfigDict(extra="allow")
+
+    question: str
+    options: List[str]
+    selected_option: int
+    correct_option: int
+
+    @field_validator("options")
+    @classmethod
+    def four_options(cls, value: List[str]) -> List[str]:
+        if len(value) != 4:
+            raise ValueError("exactly 4 options required")
+        return value
+
+    @field_validator("selected_option", "correct_option")
+    @classmethod
+    def option_in_range(cls, value: int) -> int:
+        return _option_index(value)
+
+
+def parse_attempt(entry: dict) -> dict:
+    """
+    Validates a saved attempt, reference or legacy full attempt.
+    Raises ValueError with a one-line summary when it is malformed.
+    """
+    model = FullAttempt if "question" in entry else AttemptSubmission
+    try:
+        return model.model_validate(entry).model_dump(exclude_unset=True)
+    except ValidationError as e:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in e.errors()
+        )) from None
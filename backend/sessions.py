@@ -0,0 +1,143 @@
+import os
+import random
+import time
+
+from resilience import CircuitOpen
+
+# Questions stay in a shared per-subject pool; each session only keeps
+# a bitset of the pool positions it has seen, rebased as the pool is trimmed.
+#
+# Sessions live in process memory: with several workers, route a
+# session to one worker (sticky sessions) to keep its cursor.
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(6 * 3600)))
+SHARED_POOL_MAX = int(os.getenv("SHARED_POOL_MAX", "5000"))
+
+# subject -> list of questions, position = question sequence number
+SHARED_POOL = {}
+
+# subject -> sequence number of SHARED_POOL[subject][0] (after trimming)
+POOL_BASE = {}
+
+SESSIONS = {}
+
+SESSION_STATS = {"served_from_pool": 0, "served_fresh": 0, "served_repeat": 0}
+
+_last_purge = time.monotonic()
+
+
+class Session:
+    __slots__ = ("seen", "base", "cursor", "last_active")
+
+    def __init__(self):
+        # subject -> int used as a bitset, bit i = sequence number base + i
+        self.seen = {}
+        # subject -> sequence number of bit 0 in seen
+        self.base = {}
+        # subject -> lowest sequence number that may still be unseen
+        self.cursor = {}
+        self.last_active = time.monotonic()
+
+    def _rebase(self, subject: str) -> int:
+        # Trimmed positions can never be served again: drop their bits so
+        # the bitset stays within SHARED_POOL_MAX bits
+        pool_base = POOL_BASE.get(subject, 0)
+        base = self.base.get(subject, 0)
+        if pool_base > base:
+            self.seen[subject] = self.seen.get(subject, 0) >> (pool_base - base)
+            self.base[subject] = base = pool_base
+        return base
+
+    def mark(self, subject: str, seq: int):
+        base = self._rebase(subject)
+        self.seen[subject] = self.seen.get(subject, 0) | (1 << (seq - base))
+
+    def has_seen(self, subject: str, seq: int) -> bool:
+        base = self._rebase(subject)
+        return seq >= base and (self.seen.get(subject, 0) >> (seq - base)) & 1 == 1
+
+
+def _purge_expired():
+    global _last_purge
+
+    now = time.monotonic()
+    if now - _last_purge < 60:
+        return
+    _last_purge = now
+
+    expired = [
+        session_id for session_id, session in SESSIONS.items()
+        if now - session.last_active > SESSION_TTL_SECONDS
+    ]
+    for session_id in expired:
+        del SESSIONS[session_id]
+
+
+def _append(subject: str, question: dict) -> int:
+    pool = SHARED_POOL.setdefault(subject, [])
+    base = POOL_BASE.setdefault(subject, 0)
+    pool.append(question)
+
+    # Bound memory: the oldest questions leave the pool
+    if len(pool) > SHARED_POOL_MAX:
+        drop = len(pool) - SHARED_POOL_MAX
+        del pool[:drop]
+        POOL_BASE[subject] = base + drop
+
+    return POOL_BASE[subject] + len(pool) - 1
+
+
+async def next_question(session_id: str, subject: str, get_fresh) -> dict:
+    """
+    Returns the next question this session has not seen.
+    Only when it has seen the whole shared pool is a fresh question
+    pulled (via get_fresh) and added to the pool for everyone.
+    Returns None when get_fresh does (nothing ready, no waiting).
+    """
+    _purge_expired()
+
+    session = SESSIONS.get(session_id)
+    if session is None:
+        session = SESSIONS[session_id] = Session()
+    session.last_active = time.monotonic()
+
+    pool = SHARED_POOL.get(subject, [])
+    base = POOL_BASE.get(subject, 0)
+
+    seq = max(session.cursor.get(subject, 0), base)
+    while seq < base + len(pool) and session.has_seen(subject, seq):
+        seq += 1
+
+    if seq < base + len(pool):
+        question = pool[seq - base]
+        session.cursor[subject] = seq + 1
+        SESSION_STATS["served_from_pool"] += 1
+    else:
+        # Other sessions may append while we wait, so the cursor stays
+        # at the old end of the pool and the new position is looked up
+        session.cursor[subject] = seq
+        try:
+            question = await get_fresh(subject)
+            if question is None:
+                # get_fresh without waiting found nothing buffered
+                return None
+        except CircuitOpen:
+            # LLM down: repeat a question rather than fail the session
+            if not pool:
+                raise
+            SESSION_STATS["served_repeat"] += 1
+            return random.choice(pool)
+        seq = _append(subject, question)
+        SESSION_STATS["served_fresh"] += 1
+
+    session.mark(subject, seq)
+    return question
+
+
+def stats() -> dict:
+    served = SESSION_STATS["served_from_pool"] + SESSION_STATS["served_fresh"]
+    return {
+        "active_sessions": len(SESSIONS),
+        "pool_sizes": {subject: len(pool) for subject, pool in SHARED_POOL.items()},
+        **SESSION_STATS,
+        "fresh_ratio": round(SESSION_STATS["served_fresh"] / served, 3) if served else 0.0
+    }
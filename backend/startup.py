@@ -0,0 +1,95 @@
+import asyncio
+import os
+import time
+
+import buffer
+import metrics
+import storage
+from agent import SUBJECTS
+
+# Subjects filled at startup, most-attempted first (buffer.WARM_CONCURRENCY
+# generations at a time, shared with mock-test warming)
+STARTUP_WARM_SUBJECTS = int(os.getenv("STARTUP_WARM_SUBJECTS", "3"))
+
+
+def _process_started_at() -> float:
+    # Linux: the kernel's start time, so interpreter start-up and imports
+    # are counted too; elsewhere, when this module was imported
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+PROCESS_STARTED_AT = _process_started_at()
+
+# Seconds from process start: imported, ready (lifespan done), first_question
+PHASES = {}
+
+_warm_task = None
+
+
+def mark(phase: str):
+    if phase not in PHASES:
+        PHASES[phase] = round(time.time() - PROCESS_STARTED_AT, 3)
+        metrics.STARTUP_SECONDS.set(PHASES[phase], phase)
+
+
+def first_question_served():
+    if "first_question" not in PHASES:
+        mark("first_question")
+        print(
+            f"✅ First question served {PHASES['first_question']}s after process start "
+            f"(imports {PHASES.get('imported')}s, ready {PHASES.get('ready')}s)"
+        )
+
+
+def most_used_subjects(n: int) -> list:
+    """
+    Subjects by all-time attempts, then in prompt priority order.
+    """
+    try:
+        counts = {
+            subject: summary["attempts"]
+            for subject, summary in storage.load_stats()["subjects"].items()
+        }
+    except Exception as e:
+        print("⚠️ Could not read attempt stats for warm-up:", e)
+        counts = {}
+
+    ranked = sorted(SUBJECTS, key=lambda subject: -counts.get(subject, 0))
+    return ranked[:max(0, n)]
+
+
+async def _warm(subjects: list, generate_fn):
+    started = time.monotonic()
+    await buffer.warm({subject: None for subject in subjects}, generate_fn)
+    depths = {subject: await buffer.depth(subject) for subject in subjects}
+    print(f"✅ Startup warm-up done in {time.monotonic() - started:.1f}s: {depths}")
+    mark("warm")
+
+
+def start_warm_up(generate_fn):
+    """
+    Fills the most-used subjects in the background; startup does not wait.
+    """
+    global _warm_task
+
+    subjects = most_used_subjects(STARTUP_WARM_SUBJECTS)
+    if subjects:
+        _warm_task = asyncio.create_task(_warm(subjects, generate_fn), name="startup-warm")
+    return subjects
+
+
+def status() -> dict:
+    return {
+        "process_started_at": PROCESS_STARTED_AT,
+        "phases": PHASES,
+        "warm_subjects": STARTUP_WARM_SUBJECTS,
+        "warm_concurrency": buffer.WARM_CONCURRENCY,
+        "warming": _warm_task is not None and not _warm_task.done()
+    }
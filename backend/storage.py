@@ -1,76 +1,700 @@
+import hashlib
 import json
 import os
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+import analytics
+import metrics
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
+# Overridable so benchmarks can run against a scratch store
+DATA_DIR = os.getenv("BEL_DATA_DIR", os.path.join(BASE_DIR, "data"))
 DATA_FILE = os.path.join(DATA_DIR, "bel_pe_questions.json")
+DB_FILE = os.path.join(DATA_DIR, "bel_pe.db")
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Max attempts written by one group commit
+GROUP_COMMIT_MAX = int(os.getenv("GROUP_COMMIT_MAX", "256"))
 
 
 SCOPES = ["https://www.googleapis.com/auth/documents"]
 
-def append_to_google_doc(text: str):
-    creds_dict = json.loads(os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON"))
+# Long-lived Docs client (discovery document is loaded once)
+_docs_service = None
+
+
+def get_docs_service():
+    global _docs_service
+
+    if _docs_service is None:
+        # Heavy imports, only needed once Docs sync actually runs
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+
+        creds_dict = json.loads(os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON"))
+
+        credentials = service_account.Credentials.from_service_account_info(
+            creds_dict, scopes=SCOPES
+        )
+
+        _docs_service = build("docs", "v1", credentials=credentials)
+
+    return _docs_service
+
+
+# ================= ATTEMPT STORE (SQLITE WAL) =================
+def connect():
+    """
+    Opens a connection to the attempt store.
+    WAL lets readers run while the writer commits.
+    """
+    conn = sqlite3.connect(DB_FILE, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+def _init_db(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL NOT NULL,
+            subject TEXT,
+            result TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_attempts_subject ON attempts (subject, id);
+        CREATE INDEX IF NOT EXISTS idx_attempts_result ON attempts (result, id);
+        CREATE INDEX IF NOT EXISTS idx_attempts_created ON attempts (created_at, id);
+        CREATE TABLE IF NOT EXISTS questions (
+            id TEXT PRIMARY KEY,
+            created_at REAL NOT NULL,
+            subject TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS mock_papers (
+            id TEXT PRIMARY KEY,
+            created_at REAL NOT NULL,
+            data TEXT NOT NULL,
+            result TEXT
+        );
+    """)
+
+    # Stores created before attempts referenced questions
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(attempts)")]
+    if "question_id" not in columns:
+        conn.execute("ALTER TABLE attempts ADD COLUMN question_id TEXT")
+
+    analytics.init(conn)
+    conn.commit()
+
+
+# ================= QUESTIONS =================
+# Stored once in the questions table; attempts only reference them
+QUESTION_FIELDS = ("question", "options", "correct_option", "explanation", "subject", "difficulty")
+
 
-    credentials = service_account.Credentials.from_service_account_info(
-        creds_dict, scopes=SCOPES
+def question_id(question: dict) -> str:
+    """
+    Stable content hash of the question text and options.
+    """
+    content = json.dumps(
+        [question.get("question", "").strip(), question.get("options", [])],
+        ensure_ascii=False
     )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
 
-    service = build("docs", "v1", credentials=credentials)
 
-    doc_id = os.getenv("GOOGLE_DOC_ID")
+def _question_row(question: dict, created_at: float):
+    return (
+        question["id"],
+        created_at,
+        question.get("subject"),
+        json.dumps({key: question.get(key) for key in QUESTION_FIELDS}, ensure_ascii=False)
+    )
+
+
+def save_generated(questions: list):
+    """
+    Assigns each question its id (in place) and stores new ones.
+    """
+    for question in questions:
+        question.setdefault("id", question_id(question))
+    if not questions:
+        return
+
+    conn = _local_conn()
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO questions (id, created_at, subject, data) VALUES (?, ?, ?, ?)",
+            [_question_row(question, time.time()) for question in questions]
+        )
+
+
+def get_questions(ids) -> dict:
+    ids = list(set(ids))
+    if not ids:
+        return {}
+
+    rows = _local_conn().execute(
+        "SELECT id, data FROM questions WHERE id IN (%s)" % ",".join("?" * len(ids)),
+        ids
+    ).fetchall()
+    return {row_id: {"id": row_id, **json.loads(data)} for row_id, data in rows}
+
 
-    requests = [
-        {
-            "insertText": {
-                "location": {"index": 1},
-                "text": text + "\n\n"
-            }
+def iter_questions(limit: int = None, page_size: int = 1000):
+    """
+    Yields stored questions (with ids) oldest first, page by page;
+    with a limit, only the newest `limit` of them.
+    """
+    conn = _local_conn()
+    after = 0
+    if limit is not None:
+        row = conn.execute(
+            "SELECT rowid FROM questions ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+            (max(0, limit - 1),)
+        ).fetchone()
+        after = row[0] - 1 if row else 0
+
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, id, data FROM questions WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (after, page_size)
+        ).fetchall()
+        for _, row_id, data in rows:
+            yield {"id": row_id, **json.loads(data)}
+
+        if len(rows) < page_size:
+            return
+        after = rows[-1][0]
+
+
+def _compact(entries: list) -> list:
+    """
+    Splits attempts into (question, attempt) pairs.
+    Reference attempts ({question_id, selected_option, session}) are
+    checked and scored against the stored question; full legacy
+    attempts have their question split off and stored once.
+    Raises ValueError for unknown question ids.
+    """
+    known = get_questions(
+        entry["question_id"] for entry in entries
+        if "question_id" in entry and "question" not in entry
+    )
+
+    pairs = []
+    for entry in entries:
+        if "question" in entry:
+            question = {key: entry.get(key) for key in QUESTION_FIELDS}
+            question["id"] = entry.get("question_id") or entry.get("id") or question_id(entry)
+        elif entry.get("question_id") in known:
+            question = known[entry["question_id"]]
+        else:
+            raise ValueError(f"Unknown question_id: {entry.get('question_id')}")
+
+        attempt = {
+            key: value for key, value in entry.items()
+            if key not in QUESTION_FIELDS and key != "id"
         }
-    ]
+        attempt["question_id"] = question["id"]
+        if "result" not in attempt:
+            attempt["result"] = "Correct" if attempt.get("selected_option") == question["correct_option"] else "Wrong"
 
-    service.documents().batchUpdate(
-        documentId=doc_id,
-        body={"requests": requests}
-    ).execute()
+        pairs.append((question, attempt))
 
+    return pairs
 
-def save_question(entry: dict):
-    data = []
 
-    # Safely load existing data
-    if os.path.exists(DATA_FILE):
+def _attempt_row(question: dict, attempt: dict, created_at: float):
+    return (
+        created_at,
+        question.get("subject"),
+        attempt.get("result"),
+        attempt["question_id"],
+        json.dumps(attempt, ensure_ascii=False)
+    )
+
+
+def _expand(data: str, question_data) -> dict:
+    # Attempts stored before compaction carry the whole question
+    attempt = json.loads(data)
+    if question_data is None:
+        return attempt
+    return {**json.loads(question_data), **attempt}
+
+
+# Attempt rows joined with the question they reference
+ATTEMPT_SELECT = (
+    "SELECT a.id, a.created_at, a.data, q.data FROM attempts a "
+    "LEFT JOIN questions q ON q.id = a.question_id"
+)
+
+
+def _ensure_store_id(conn):
+    # Distinguishes this store from a recreated one (for derived caches)
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', ?)",
+            (uuid.uuid4().hex,)
+        )
+
+
+def _migrate_json_file(conn):
+    """
+    One-time import of the legacy bel_pe_questions.json list.
+    The old file is kept as *.migrated for reference.
+    """
+    if not os.path.exists(DATA_FILE):
+        return
+
+    # IMMEDIATE: the check, the import and the meta row are one write
+    # transaction, so concurrent workers cannot import the file twice
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        done = conn.execute(
+            "SELECT value FROM meta WHERE key = 'json_migrated'"
+        ).fetchone()
+        if done or not os.path.exists(DATA_FILE):
+            conn.rollback()
+            return
+
+        data = []
         try:
             with open(DATA_FILE, "r", encoding="utf-8") as f:
                 content = f.read().strip()
                 if content:
                     data = json.loads(content)
         except Exception as e:
-            print("⚠️ JSON load failed, recreating file:", e)
-            data = []
+            print("⚠️ JSON migration failed, skipping legacy file:", e)
+            conn.rollback()
+            return
 
-    # Append new entry
-    data.append(entry)
+        if not isinstance(data, list):
+            print(f"⚠️ JSON migration skipped: {DATA_FILE} does not hold a list")
+            conn.rollback()
+            return
 
-    # Safely write back
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+        entries = [entry for entry in data if isinstance(entry, dict)]
+        if len(entries) < len(data):
+            print(f"⚠️ JSON migration skipped {len(data) - len(entries)} entries that are not objects")
 
+        now = time.time()
+        conn.executemany(
+            "INSERT INTO attempts (created_at, subject, result, data) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (now, entry.get("subject"), entry.get("result"), json.dumps(entry, ensure_ascii=False))
+                for entry in entries
+            ]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+            (str(len(entries)),)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    os.replace(DATA_FILE, DATA_FILE + ".migrated")
+    print(f"✅ Migrated {len(entries)} attempts from {DATA_FILE}")
+
+
+class _PendingWrite:
+    def __init__(self, entries: list):
+        # (question, attempt) pairs
+        self.entries = entries
+        self.done = threading.Event()
+        self.error = None
+
+
+class AttemptWriter:
+    """
+    Single writer thread.
+    Everything queued while a commit is in flight goes into the
+    next transaction, so a burst of saves costs one fsync.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="attempt-writer", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, entries: list):
+        pending = _PendingWrite(entries)
+        self._queue.put(pending)
+        pending.done.wait()
+
+        if pending.error is not None:
+            raise pending.error
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        conn = connect()
+        stopping = False
+
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch = [first]
+            size = len(first.entries)
+            while size < GROUP_COMMIT_MAX:
+                try:
+                    pending = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if pending is None:
+                    stopping = True
+                    break
+                batch.append(pending)
+                size += len(pending.entries)
+
+            error = None
+            try:
+                now = time.time()
+                pairs = [pair for pending in batch for pair in pending.entries]
+                with conn:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO questions (id, created_at, subject, data) "
+                        "VALUES (?, ?, ?, ?)",
+                        [_question_row(question, now) for question, _ in pairs]
+                    )
+                    conn.executemany(
+                        "INSERT INTO attempts (created_at, subject, result, question_id, data) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [_attempt_row(question, attempt, now) for question, attempt in pairs]
+                    )
+
+                    # Ids are sequential: this thread holds the write lock
+                    last_id = conn.execute("SELECT MAX(id) FROM attempts").fetchone()[0]
+                    first_id = last_id - len(pairs) + 1
+                    analytics.apply(conn, [
+                        (first_id + i, now, question.get("subject"), question.get("difficulty"), attempt.get("result"))
+                        for i, (question, attempt) in enumerate(pairs)
+                    ])
+                metrics.STORAGE_COMMIT_SIZE.observe(size)
+            except Exception as e:
+                print("⚠️ Attempt write failed:", e)
+                error = e
+
+            for pending in batch:
+                pending.error = error
+                pending.done.set()
+
+        conn.close()
 
-def load_all_questions():
-    if not os.path.exists(DATA_FILE):
-        return []
 
+def _catch_up_analytics(conn, page_size: int = 5000):
+    """
+    Folds attempts the aggregates have not seen yet (stores created
+    before analytics existed) into them, one page per transaction.
+    """
+    applied = 0
+    while True:
+        # IMMEDIATE: another process may be catching up at the same time
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                ATTEMPT_SELECT + " WHERE a.id > ? ORDER BY a.id LIMIT ?",
+                (analytics.last_applied_id(conn), page_size)
+            ).fetchall()
+
+            records = []
+            for row_id, created_at, data, question in rows:
+                attempt = _expand(data, question)
+                records.append((
+                    row_id, created_at, attempt.get("subject"),
+                    attempt.get("difficulty"), attempt.get("result")
+                ))
+            analytics.apply(conn, records)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        applied += len(rows)
+        if len(rows) < page_size:
+            break
+
+    if applied:
+        print(f"✅ Analytics built from {applied} stored attempts")
+
+
+_writer = None
+_initialized = False
+_init_lock = threading.Lock()
+_local = threading.local()
+
+
+def _ensure_initialized():
+    global _initialized
+
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn = connect()
+                _init_db(conn)
+                _ensure_store_id(conn)
+                _migrate_json_file(conn)
+                _catch_up_analytics(conn)
+                conn.close()
+                _initialized = True
+
+
+def _get_writer():
+    global _writer
+
+    if _writer is None:
+        _ensure_initialized()
+        with _init_lock:
+            if _writer is None:
+                _writer = AttemptWriter()
+
+    return _writer
+
+
+def _local_conn():
+    """
+    One connection per thread for reads and small meta updates.
+    Read-only processes (e.g. PDF workers) never start the writer.
+    """
+    _ensure_initialized()
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = connect()
+        _local.conn = conn
+    return conn
+
+
+def close():
+    """
+    Flushes pending writes and stops the writer thread.
+    """
+    global _writer
+
+    with _init_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+def save_question(entry: dict):
+    # Returns once the attempt is committed to disk
+    with metrics.STORAGE_SAVE_SECONDS.time():
+        _get_writer().write(_compact([entry]))
+
+
+def save_questions(entries: list):
+    # Many attempts, one transaction
+    if not entries:
+        return
+    with metrics.STORAGE_SAVE_SECONDS.time():
+        _get_writer().write(_compact(entries))
+
+
+def load_all_questions():
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if content:
-                return json.loads(content)
+        rows = _local_conn().execute(ATTEMPT_SELECT + " ORDER BY a.id").fetchall()
     except Exception as e:
-        print("⚠️ JSON load failed:", e)
+        print("⚠️ Attempt store load failed:", e)
+        return []
+
+    return [_expand(data, question) for _, _, data, question in rows]
+
+
+def load_attempts_after(after_id: int, limit: int):
+    """
+    Returns [(id, attempt), ...] stored after the given id.
+    """
+    rows = _local_conn().execute(
+        ATTEMPT_SELECT + " WHERE a.id > ? ORDER BY a.id LIMIT ?",
+        (after_id, limit)
+    ).fetchall()
+
+    return [(row_id, _expand(data, question)) for row_id, _, data, question in rows]
+
+
+def last_attempt_id(subject: str = None):
+    # One index seek (primary key, or the (subject, id) index)
+    where, params = _subject_filter(subject)
+    row = _local_conn().execute("SELECT MAX(id) FROM attempts" + where, params).fetchone()
+    return row[0] or 0
+
+
+def get_meta(key: str, default=None):
+    row = _local_conn().execute(
+        "SELECT value FROM meta WHERE key = ?", (key,)
+    ).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(key: str, value):
+    conn = _local_conn()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (key, str(value))
+        )
+
+
+def load_stats() -> dict:
+    # Precomputed aggregates: cost does not grow with the history
+    return analytics.read(_local_conn())
+
+
+def store_id() -> str:
+    return get_meta("store_id")
+
+
+def _subject_filter(subject, table: str = "attempts"):
+    if subject is None:
+        return "", ()
+    return f" WHERE {table}.subject = ?", (subject,)
+
+
+def attempt_version(subject: str = None):
+    """
+    (count, last_id) of the attempts in scope.
+    The store is append-only, so this changes on every new attempt.
+    """
+    where, params = _subject_filter(subject)
+    row = _local_conn().execute(
+        "SELECT COUNT(*), MAX(id) FROM attempts" + where, params
+    ).fetchone()
+    return row[0], row[1] or 0
+
+
+def load_attempts(subject: str = None, offset: int = 0, limit: int = -1):
+    """
+    Attempts in store order, optionally one subject and one slice.
+    """
+    where, params = _subject_filter(subject, "a")
+    rows = _local_conn().execute(
+        ATTEMPT_SELECT + where + " ORDER BY a.id LIMIT ? OFFSET ?",
+        params + (limit, offset)
+    ).fetchall()
+    return [_expand(data, question) for _, _, data, question in rows]
+
+
+# ================= MOCK PAPERS =================
+# Shared by every worker, so a paper can be submitted to any of them
+def save_mock_paper(paper: dict):
+    conn = _local_conn()
+    with conn:
+        conn.execute(
+            "INSERT INTO mock_papers (id, created_at, data) VALUES (?, ?, ?)",
+            (paper["paper_id"], paper["created_at"], json.dumps(paper, ensure_ascii=False))
+        )
+
+
+def get_mock_paper(paper_id: str):
+    row = _local_conn().execute(
+        "SELECT data, result FROM mock_papers WHERE id = ?", (paper_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    return {**json.loads(row[0]), "submitted": json.loads(row[1]) if row[1] else None}
+
+
+def finish_mock_paper(paper_id: str, result: dict) -> bool:
+    """
+    Records a paper's result once; False if it was already submitted.
+    """
+    conn = _local_conn()
+    with conn:
+        cursor = conn.execute(
+            "UPDATE mock_papers SET result = ? WHERE id = ? AND result IS NULL",
+            (json.dumps(result, ensure_ascii=False), paper_id)
+        )
+    return cursor.rowcount == 1
+
+
+def purge_mock_papers(before: float):
+    conn = _local_conn()
+    with conn:
+        conn.execute("DELETE FROM mock_papers WHERE created_at < ?", (before,))
+
+
+def count_open_mock_papers(since: float) -> int:
+    row = _local_conn().execute(
+        "SELECT COUNT(*) FROM mock_papers WHERE result IS NULL AND created_at >= ?", (since,)
+    ).fetchone()
+    return row[0]
+
+
+# ================= INDEXED QUERIES =================
+def query_attempts(
+    subject: str = None,
+    result: str = None,
+    since: float = None,
+    until: float = None,
+    after_id: int = 0,
+    limit: int = 100
+):
+    """
+    One page of attempts matching the filters, oldest first.
+    Keyset pagination on id: pass the returned cursor as after_id.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    clauses = ["a.id > ?"]
+    params = [after_id]
+
+    if subject is not None:
+        clauses.append("a.subject = ?")
+        params.append(subject)
+    if result is not None:
+        clauses.append("a.result = ?")
+        params.append(result)
+    if since is not None:
+        clauses.append("a.created_at >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("a.created_at < ?")
+        params.append(until)
+
+    rows = _local_conn().execute(
+        ATTEMPT_SELECT + " WHERE "
+        + " AND ".join(clauses)
+        + " ORDER BY a.id LIMIT ?",
+        params + [limit + 1]
+    ).fetchall()
+
+    items = [
+        {**_expand(data, question), "id": row_id, "created_at": created_at}
+        for row_id, created_at, data, question in rows[:limit]
+    ]
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+
+    return items, next_cursor
+
+
+def iter_attempts(page_size: int = 500, **filters):
+    """
+    Yields matching attempts page by page; memory stays flat.
+    """
+    after_id = 0
+    while True:
+        items, next_cursor = query_attempts(after_id=after_id, limit=page_size, **filters)
+        yield from items
 
-    return []
+        if next_cursor is None:
+            return
+        after_id = next_cursor
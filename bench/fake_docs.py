@@ -0,0 +1,86 @@
+"""
+Local stand-in for the Google Docs batchUpdate API.
+
+    python bench/fake_docs.py --port 8090 --error-rate 0.2 --latency 0.3
+    GOOGLE_DOCS_ENDPOINT=http://localhost:8090 GOOGLE_DOC_ID=test uvicorn main:app
+
+GET /stats returns call counts and the number of inserted attempts.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BATCH_UPDATE_PATH = re.compile(r"^/v1/documents/([^/:]+):batchUpdate$")
+
+STATS = {"calls": 0, "failed_calls": 0, "inserts": 0, "attempts": 0, "chars": 0}
+DOCUMENTS = {}
+LOCK = threading.Lock()
+
+
+class FakeDocsHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+
+    def do_POST(self):
+        match = BATCH_UPDATE_PATH.match(self.path)
+        if not match:
+            return self._reply(404, {"error": "not found"})
+
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.latency)
+
+        with LOCK:
+            STATS["calls"] += 1
+            if random.random() < self.error_rate:
+                STATS["failed_calls"] += 1
+                return self._reply(503, {"error": "injected failure"})
+
+            doc = DOCUMENTS.setdefault(match.group(1), [])
+            for request in body.get("requests", []):
+                text = request["insertText"]["text"]
+                doc.insert(0, text)
+                STATS["inserts"] += 1
+                STATS["attempts"] += text.count("\nQ. ")
+                STATS["chars"] += len(text)
+
+        self._reply(200, {"documentId": match.group(1), "replies": []})
+
+    def do_GET(self):
+        if self.path != "/stats":
+            return self._reply(404, {"error": "not found"})
+
+        with LOCK:
+            self._reply(200, STATS)
+
+    def _reply(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port: int, latency: float = 0.0, error_rate: float = 0.0):
+    FakeDocsHandler.latency = latency
+    FakeDocsHandler.error_rate = error_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeDocsHandler)
+    print(f"Fake Docs API on http://127.0.0.1:{port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    serve(args.port, args.latency, args.error_rate)
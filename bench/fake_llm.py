@@ -0,0 +1,176 @@
+"""
+Local stand-in for the Ollama chat API (/api/chat), streaming or not.
+
+    python bench/fake_llm.py --port 8091 --latency 2 --error-rate 0.1 --slow-rate 0.05
+    OLLAMA_API_URL=http://localhost:8091/api/chat uvicorn main:app
+
+Every answer is a valid {"questions": [...]} document for the subjects
+and count named in the prompt, unless an error or a malformed question
+is injected. GET /stats returns call counts.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COUNT = re.compile(r"exactly (\d+) MCQs")
+SUBJECTS = re.compile(r"'([^']+)'")
+
+STATS = {"calls": 0, "streamed": 0, "failed_calls": 0, "slow_calls": 0, "questions": 0, "malformed": 0}
+LOCK = threading.Lock()
+
+
+# Random wording, so generated questions are not near-duplicates of each other
+WORDS = (
+    "buffer index latency queue stack heap tree graph page frame cache table key "
+    "lock thread process packet router layer token grammar parser register pipeline "
+    "gate adder clock signal class object method interface model feature sample "
+    "error bound order pointer segment window socket schema query"
+).split()
+
+
+def make_question(subject: str, broken: bool) -> dict:
+    topic = " ".join(random.sample(WORDS, 8))
+    question = {
+        "question": f"In {subject}, which statement about {topic} is correct?",
+        "options": [f"Option {uuid.uuid4().hex[:6]}" for _ in range(4)],
+        "correct_option": random.randrange(4),
+        "explanation": "Only this option matches the standard textbook definition.",
+        "subject": subject,
+        "difficulty": random.choice(["Easy", "Moderate", "Difficult"])
+    }
+    if broken:
+        # Fails validation, not JSON parsing
+        question["options"] = question["options"][:2]
+    return question
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    latency = 2.0
+    jitter = 0.0
+    error_rate = 0.0
+    slow_rate = 0.0
+    slow_latency = 30.0
+    slow_first = 0
+    malformed_rate = 0.0
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            return self._reply(404, {"error": "not found"})
+
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        count = int(COUNT.search(prompt).group(1)) if COUNT.search(prompt) else 10
+        subjects = SUBJECTS.findall(prompt) or ["Data Structures"]
+        stream = bool(body.get("stream"))
+
+        latency = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+        with LOCK:
+            STATS["calls"] += 1
+            slow = STATS["calls"] <= self.slow_first or random.random() < self.slow_rate
+            if slow:
+                latency = self.slow_latency
+            STATS["streamed"] += stream
+            STATS["slow_calls"] += slow
+            if random.random() < self.error_rate:
+                STATS["failed_calls"] += 1
+                failed = True
+            else:
+                failed = False
+
+        if failed:
+            time.sleep(latency / 4)
+            return self._reply(503, {"error": "injected failure"})
+
+        questions = []
+        for subject in subjects:
+            for _ in range(count):
+                broken = random.random() < self.malformed_rate
+                questions.append(make_question(subject, broken))
+
+        with LOCK:
+            STATS["questions"] += len(questions)
+            STATS["malformed"] += sum(len(q["options"]) != 4 for q in questions)
+
+        text = json.dumps({"questions": questions}, indent=2)
+        usage = {"prompt_eval_count": len(body["messages"][0]["content"]) // 4, "eval_count": len(text) // 4}
+
+        if not stream:
+            time.sleep(latency)
+            return self._reply(200, {"message": {"role": "assistant", "content": text}, "done": True, **usage})
+
+        # NDJSON chunks spread over the latency, token counts in the last one
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        step = 40
+        pieces = max(1, len(text) // step)
+        for i in range(0, len(text), step):
+            time.sleep(latency / pieces)
+            self._chunk({"message": {"role": "assistant", "content": text[i:i + step]}, "done": False})
+        self._chunk({"message": {"role": "assistant", "content": ""}, "done": True, **usage})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        if self.path != "/stats":
+            return self._reply(404, {"error": "not found"})
+
+        with LOCK:
+            self._reply(200, STATS)
+
+    def _chunk(self, payload: dict):
+        data = (json.dumps(payload) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _reply(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port: int, **options):
+    for name, value in options.items():
+        setattr(FakeLLMHandler, name, value)
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeLLMHandler)
+    print(f"Fake LLM API on http://127.0.0.1:{port}/api/chat")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds per full response")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of calls taking --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=30.0)
+    parser.add_argument("--slow-first", type=int, default=0, help="the first N calls take --slow-latency")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of questions failing validation")
+    args = parser.parse_args()
+
+    serve(
+        args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        slow_first=args.slow_first,
+        malformed_rate=args.malformed_rate
+    )
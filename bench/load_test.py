@@ -0,0 +1,311 @@
+"""
+Load generator: N concurrent practice sessions against a running backend.
+
+    python bench/fake_llm.py --port 8091 --latency 20 &
+    python bench/fake_docs.py --port 8090 &
+    BEL_DATA_DIR=/tmp/bel-bench OLLAMA_API_URL=http://localhost:8091/api/chat \\
+        GOOGLE_DOCS_ENDPOINT=http://localhost:8090 GOOGLE_DOC_ID=bench uvicorn main:app --port 8000
+
+    python bench/load_test.py --sessions 50 --duration 60 --out bench/results/$(git rev-parse --short HEAD).json
+    python bench/load_test.py --compare bench/results/old.json bench/results/new.json
+
+Each session loops: /next-question -> think -> /save-attempt, and now and
+then downloads a PDF. Reports p50/p95/p99 per endpoint, the buffer-miss
+rate, LLM calls per served question and save throughput as the attempt
+history grows. Results are written as JSON for comparison across commits.
+The save phase writes benchmark attempts, so point BEL_DATA_DIR at a
+scratch directory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import time
+import uuid
+
+import httpx
+
+SUBJECTS = [
+    "Data Structures",
+    "Operating Systems",
+    "Computer Networks",
+    "DBMS",
+    "Algorithms",
+]
+
+METRIC_LINE = re.compile(r'^bel_questions_served_total\{subject="[^"]*",source="(\w+)"\} ([0-9.e+]+)$')
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+
+def summarize(latencies: list, errors: int) -> dict:
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else None
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    async def call(self, name: str, request):
+        started = time.perf_counter()
+        try:
+            response = await request
+            response.raise_for_status()
+        except Exception:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+        return response
+
+    def report(self) -> dict:
+        names = set(self.latencies) | set(self.errors)
+        return {
+            name: summarize(self.latencies.get(name, []), self.errors.get(name, 0))
+            for name in sorted(names)
+        }
+
+
+# ================= SERVER COUNTERS =================
+async def served_counts(client: httpx.AsyncClient) -> dict:
+    """
+    {"buffer": n, "wait": n} from /metrics (summed over subjects).
+    """
+    counts = {"buffer": 0.0, "wait": 0.0}
+    try:
+        response = await client.get("/metrics")
+        for line in response.text.splitlines():
+            match = METRIC_LINE.match(line)
+            if match:
+                counts[match.group(1)] = counts.get(match.group(1), 0.0) + float(match.group(2))
+    except httpx.HTTPError:
+        pass
+    return counts
+
+
+async def llm_calls(url: str):
+    if not url:
+        return None
+    try:
+        async with httpx.AsyncClient() as client:
+            return (await client.get(url)).json()["calls"]
+    except (httpx.HTTPError, KeyError, ValueError):
+        return None
+
+
+# ================= SESSIONS =================
+def make_attempt(question: dict, session: str = None) -> dict:
+    selected = random.randrange(4)
+    if "id" in question:
+        # Reference attempt, as the frontend sends it
+        return {"question_id": question["id"], "selected_option": selected, "session": session}
+    return {
+        **question,
+        "selected_option": selected,
+        "result": "correct" if selected == question.get("correct_option") else "wrong"
+    }
+
+
+async def practice_session(client, recorder: Recorder, deadline: float, args):
+    session = uuid.uuid4().hex
+    subject = random.choice(SUBJECTS[:args.subjects])
+
+    while time.monotonic() < deadline:
+        response = await recorder.call(
+            "next_question",
+            client.get("/next-question", params={"subject": subject, "session": session})
+        )
+        await asyncio.sleep(random.uniform(0, args.think))
+
+        if response is not None:
+            await recorder.call("save_attempt", client.post("/save-attempt", json=make_attempt(response.json(), session)))
+
+        if random.random() < args.pdf_rate:
+            await recorder.call("download_pdf", client.get(f"/download-pdf/{subject}"))
+
+
+async def run_load(args) -> dict:
+    limits = httpx.Limits(max_connections=args.sessions + 10)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+        served_before = await served_counts(client)
+        llm_before = await llm_calls(args.llm_stats)
+
+        recorder = Recorder()
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            practice_session(client, recorder, deadline, args) for _ in range(args.sessions)
+        ))
+        elapsed = time.monotonic() - started
+
+        served_after = await served_counts(client)
+        llm_after = await llm_calls(args.llm_stats)
+
+    # Session requests answered from the shared pool never touch the
+    # buffer, so rates are per served /next-question request
+    misses = served_after["wait"] - served_before["wait"]
+    endpoints = recorder.report()
+    served = endpoints.get("next_question", {}).get("count", 0)
+
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "endpoints": endpoints,
+        "served_questions": served,
+        "buffer_pops": int(served_after["buffer"] - served_before["buffer"] + misses),
+        "buffer_miss_rate": round(misses / served, 4) if served else None,
+        "llm_calls": None if llm_before is None else llm_after - llm_before,
+        "llm_calls_per_question": (
+            round((llm_after - llm_before) / served, 4)
+            if llm_before is not None and served else None
+        ),
+        "questions_per_s": round(served / elapsed, 2)
+    }
+
+
+# ================= SAVE THROUGHPUT =================
+async def save_throughput(args) -> list:
+    """
+    Saves/s at increasing history sizes. History is grown with the same
+    endpoint, so every step measures the store as it really is.
+    """
+    question = {
+        "question": "Benchmark question?",
+        "options": ["a", "b", "c", "d"],
+        "correct_option": 0,
+        "explanation": "Benchmark.",
+        "subject": "Benchmark",
+        "difficulty": "Easy"
+    }
+    steps = []
+    limits = httpx.Limits(max_connections=args.save_concurrency + 5)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        semaphore = asyncio.Semaphore(args.save_concurrency)
+
+        async def save():
+            async with semaphore:
+                await client.post("/save-attempt", json=make_attempt(question))
+
+        history = 0
+        for target in args.history_steps:
+            # Grow the history to the next step (not timed)
+            if target > history:
+                await asyncio.gather(*(save() for _ in range(target - history)))
+                history = target
+
+            started = time.perf_counter()
+            await asyncio.gather(*(save() for _ in range(args.save_samples)))
+            elapsed = time.perf_counter() - started
+            history += args.save_samples
+
+            steps.append({
+                "history": target,
+                "saves_per_s": round(args.save_samples / elapsed, 1)
+            })
+            print(f"  history {target:>7}: {steps[-1]['saves_per_s']} saves/s")
+
+    return steps
+
+
+# ================= COMPARE =================
+def compare(old_path: str, new_path: str):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    def row(label, a, b):
+        if a is None or b is None:
+            change = ""
+        elif a:
+            change = f"{(b - a) / a * 100:+.1f}%"
+        else:
+            change = "n/a"
+        print(f"{label:<36} {str(a):>12} {str(b):>12} {change:>9}")
+
+    print(f"{'':<36} {old.get('commit', 'old'):>12} {new.get('commit', 'new'):>12}")
+    for name in sorted(set(old["load"]["endpoints"]) | set(new["load"]["endpoints"])):
+        for key in ("p50_ms", "p95_ms", "p99_ms", "errors"):
+            row(f"{name}.{key}",
+                old["load"]["endpoints"].get(name, {}).get(key),
+                new["load"]["endpoints"].get(name, {}).get(key))
+    for key in ("buffer_miss_rate", "llm_calls_per_question", "questions_per_s"):
+        row(key, old["load"].get(key), new["load"].get(key))
+
+    old_saves = {step["history"]: step["saves_per_s"] for step in old.get("saves", [])}
+    for step in new.get("saves", []):
+        row(f"saves_per_s@{step['history']}", old_saves.get(step["history"]), step["saves_per_s"])
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    results = {
+        "commit": git_commit(),
+        "started_at": time.time(),
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("compare", "out")
+        }
+    }
+
+    print(f"Load: {args.sessions} sessions for {args.duration}s against {args.base_url}")
+    results["load"] = await run_load(args)
+    print(json.dumps(results["load"], indent=2))
+
+    if args.history_steps:
+        print("Save throughput:")
+        results["saves"] = await save_throughput(args)
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--llm-stats", default="http://127.0.0.1:8091/stats",
+                        help="fake LLM /stats URL ('' to skip LLM call counting)")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--subjects", type=int, default=3, help="subjects spread over sessions")
+    parser.add_argument("--think", type=float, default=1.0, help="max seconds between questions")
+    parser.add_argument("--pdf-rate", type=float, default=0.01, help="chance of a PDF download per question")
+    parser.add_argument("--timeout", type=float, default=400)
+    parser.add_argument("--history-steps", type=int, nargs="*", default=[0, 1000, 10000],
+                        help="attempt-history sizes to measure save throughput at")
+    parser.add_argument("--save-samples", type=int, default=500)
+    parser.add_argument("--save-concurrency", type=int, default=50)
+    parser.add_argument("--out", help="write JSON results here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        asyncio.run(main(args))
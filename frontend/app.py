@@ -1,6 +1,9 @@
 import streamlit as st
 import requests
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
 
 # ================= CONFIG =================
@@ -8,6 +11,40 @@ import os
 
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 
+# Local question queue: topped up in the background below this size
+QUEUE_LOW_WATER = 3
+QUEUE_BATCH = 5
+
+# Attempts are saved in the background, at most this many per request
+SAVE_BATCH_MAX = 50
+SAVE_BACKOFF_MAX = 30
+
+# Each session has at most one prefetch and one save in flight, so the
+# shared pools get one thread per concurrent session each
+FRONTEND_MAX_SESSIONS = int(os.getenv("FRONTEND_MAX_SESSIONS", "32"))
+
+
+@st.cache_resource
+def http_session():
+    # One keep-alive connection pool for every rerun and user
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=2 * FRONTEND_MAX_SESSIONS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def prefetch_executor():
+    return ThreadPoolExecutor(max_workers=FRONTEND_MAX_SESSIONS, thread_name_prefix="prefetch")
+
+
+@st.cache_resource
+def save_executor():
+    # Separate pool: slow question fetches never hold up saves
+    return ThreadPoolExecutor(max_workers=FRONTEND_MAX_SESSIONS, thread_name_prefix="save")
+
+
 st.set_page_config(
     page_title="BEL PE CBT Practice",
     layout="centered"
@@ -43,6 +80,35 @@ if "subject" not in st.session_state:
 if "is_prefetching" not in st.session_state:
     st.session_state.is_prefetching = False
 
+# Backend tracks which shared-pool questions this session has seen
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Questions fetched ahead of time, and the in-flight top-up
+if "question_queue" not in st.session_state:
+    st.session_state.question_queue = []
+
+if "prefetch_future" not in st.session_state:
+    st.session_state.prefetch_future = None
+
+# Attempts not yet confirmed by the backend, and the in-flight save
+if "pending_attempts" not in st.session_state:
+    st.session_state.pending_attempts = []
+
+if "save_future" not in st.session_state:
+    st.session_state.save_future = None
+    st.session_state.saving_batch = []
+
+if "save_failures" not in st.session_state:
+    st.session_state.save_failures = 0
+
+if "next_save_at" not in st.session_state:
+    st.session_state.next_save_at = 0.0
+
+# Attempts the backend refused (4xx): never retried
+if "rejected_attempts" not in st.session_state:
+    st.session_state.rejected_attempts = 0
+
 # ================= SIDEBAR =================
 st.sidebar.header("⚙️ Practice Setup")
 
@@ -65,6 +131,8 @@ if st.sidebar.button("▶️ Start Practice"):
     st.session_state.subject = selected_subject
     st.session_state.practice_started = True
     st.session_state.current_question = None
+    st.session_state.question_queue = []
+    st.session_state.prefetch_future = None
     st.session_state.qa_log = []
     st.session_state.correct = 0
     st.session_state.attempted = 0
@@ -151,16 +219,132 @@ for sub in subjects:
     )
 
 
+st.sidebar.divider()
+st.sidebar.subheader("🗂️ Full Attempt History")
+
+# Streamed by the backend, so any history size downloads instantly
+export_links = " · ".join(
+    f"[{fmt.upper()}]({BACKEND_URL}/export?format={fmt})"
+    for fmt in ("txt", "csv", "jsonl")
+)
+st.sidebar.markdown(f"⬇️ Download all attempts: {export_links}")
+
+
 # ================= FETCH QUESTION (SAFE) =================
-def fetch_question():
-    res = requests.get(
-        f"{BACKEND_URL}/next-question",
-        params={"subject": st.session_state.subject},
+def fetch_batch(subject: str, session_id: str, n: int):
+    # Runs in the prefetch executor: no st.* calls in here
+    res = http_session().get(
+        f"{BACKEND_URL}/next-questions",
+        params={"subject": subject, "session": session_id, "n": n},
         timeout=500
     )
-    st.session_state.current_question = res.json()
+    res.raise_for_status()
+    return subject, res.json()
+
+
+def collect_prefetched(block: bool = False):
+    future = st.session_state.prefetch_future
+    if future is None or (not block and not future.done()):
+        return
+
+    st.session_state.prefetch_future = None
+    try:
+        subject, questions = future.result()
+    except Exception:
+        return
+
+    # Drop a batch fetched for a subject the user has since left
+    if subject == st.session_state.subject:
+        st.session_state.question_queue.extend(questions)
+
+
+def top_up_queue():
+    collect_prefetched()
+
+    if (
+        st.session_state.prefetch_future is None
+        and len(st.session_state.question_queue) < QUEUE_LOW_WATER
+    ):
+        st.session_state.prefetch_future = prefetch_executor().submit(
+            fetch_batch,
+            st.session_state.subject,
+            st.session_state.session_id,
+            QUEUE_BATCH
+        )
+
+
+def fetch_question():
+    # Instant when the local queue has a question
+    if not st.session_state.question_queue:
+        top_up_queue()
+        collect_prefetched(block=True)
+
+    if st.session_state.question_queue:
+        st.session_state.current_question = st.session_state.question_queue.pop(0)
+    else:
+        # Prefetch failed: one direct request
+        res = http_session().get(
+            f"{BACKEND_URL}/next-question",
+            params={
+                "subject": st.session_state.subject,
+                "session": st.session_state.session_id
+            },
+            timeout=500
+        )
+        st.session_state.current_question = res.json()
+
     st.session_state.selected_option = None
     st.session_state.locked = False
+    top_up_queue()
+
+
+# ================= SAVE ATTEMPTS (BACKGROUND) =================
+def post_attempts(batch: list):
+    # Runs in the save executor: no st.* calls in here
+    res = http_session().post(f"{BACKEND_URL}/save-attempts", json=batch, timeout=30)
+    res.raise_for_status()
+    return res.json()
+
+
+def save_rejected(error: Exception) -> bool:
+    # 4xx: the backend will never accept this batch; anything else is retried
+    response = getattr(error, "response", None)
+    return response is not None and 400 <= response.status_code < 500
+
+
+def flush_attempts():
+    """
+    Never blocks: collects the finished save (re-queueing it with
+    backoff on server or connection errors) and starts the next one.
+    Attempts the backend rejects (4xx) are dropped, never retried.
+    Attempts made while a save is in flight go out in the next batch.
+    """
+    future = st.session_state.save_future
+    if future is not None and future.done():
+        st.session_state.save_future = None
+        try:
+            result = future.result()
+            st.session_state.save_failures = 0
+            st.session_state.rejected_attempts += len(result.get("rejected", []))
+        except Exception as e:
+            if save_rejected(e):
+                st.session_state.rejected_attempts += len(st.session_state.saving_batch)
+            else:
+                st.session_state.pending_attempts[:0] = st.session_state.saving_batch
+                st.session_state.save_failures += 1
+                delay = min(SAVE_BACKOFF_MAX, 2 ** st.session_state.save_failures)
+                st.session_state.next_save_at = time.time() + delay
+
+    if (
+        st.session_state.save_future is None
+        and st.session_state.pending_attempts
+        and time.time() >= st.session_state.next_save_at
+    ):
+        batch = st.session_state.pending_attempts[:SAVE_BATCH_MAX]
+        del st.session_state.pending_attempts[:SAVE_BATCH_MAX]
+
+        st.session_state.saving_batch = batch
+        st.session_state.save_future = save_executor().submit(post_attempts, batch)
 
 
 # ================= INITIAL LOAD =================
@@ -171,6 +355,12 @@ if not st.session_state.practice_started:
 if st.session_state.current_question is None:
     fetch_question()
 
+# Pick up a finished background batch, start the next one if low
+top_up_queue()
+
+# Retry unsaved attempts on every rerun
+flush_attempts()
+
 q = st.session_state.current_question
 if q is None:
     st.warning("Loading question... please wait.")
@@ -217,15 +407,22 @@ if st.button("Submit Answer", disabled=st.session_state.locked):
     # ✅ Save locally (session)
     st.session_state.qa_log.append(attempt_data)
 
-    # ✅ Save permanently (backend)
-    try:
-        requests.post(
-            f"{BACKEND_URL}/save-attempt",
-            json=attempt_data,
-            timeout=10
-        )
-    except Exception:
-        st.warning("⚠️ Could not save attempt to server.")
+    # ✅ Save permanently (backend), in the background; the backend
+    # already stores the question, so only a reference is sent
+    if q.get("id"):
+        st.session_state.pending_attempts.append({
+            "question_id": q["id"],
+            "selected_option": st.session_state.selected_option,
+            "session": st.session_state.session_id
+        })
+    else:
+        st.session_state.pending_attempts.append(attempt_data)
+    flush_attempts()
+
+    if st.session_state.save_failures:
+        st.warning("⚠️ Could not save attempts to server yet, retrying in the background.")
+    if st.session_state.rejected_attempts:
+        st.warning(f"⚠️ {st.session_state.rejected_attempts} attempt(s) were rejected by the server and not saved.")
 
     # ✅ Show explanation
     st.info(f"📘 **Explanation:** {q['explanation']}")
@@ -249,6 +446,31 @@ st.write(f"**Attempted:** {st.session_state.attempted}")
 st.write(f"**Correct:** {st.session_state.correct}")
 st.write(f"**Accuracy:** {accuracy:.2f}%")
 
+# All-time numbers survive reloads; the backend keeps them up to date
+try:
+    all_time = http_session().get(f"{BACKEND_URL}/stats", timeout=5).json()
+except Exception:
+    all_time = None
+
+if all_time:
+    subject_stats = all_time["subjects"].get(st.session_state.subject)
+    if subject_stats and subject_stats["attempts"]:
+        st.caption(f"All-time in {st.session_state.subject}")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Attempted", subject_stats["attempts"])
+        col2.metric("Accuracy", f"{subject_stats['accuracy'] * 100:.1f}%")
+        col3.metric("Best streak", subject_stats["best_streak"])
+
+    overall = all_time["overall"]
+    if overall["attempts"]:
+        last_7d = overall["windows"]["7d"]
+        st.caption(
+            f"Overall: {overall['attempts']} attempted, "
+            f"{overall['accuracy'] * 100:.1f}% correct, "
+            f"{last_7d['attempts']} in the last 7 days, "
+            f"{overall['day_streak']}-day streak"
+        )
+
 # ================= TXT EXPORT =================
 def generate_txt():
     lines = []
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+# Stores and leases go to a scratch directory, never the repo's data/
+os.environ.setdefault("BEL_DATA_DIR", tempfile.mkdtemp(prefix="bel-tests-"))
+
+import agent  # noqa: E402
+import resilience  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeLLM:
+    def __init__(self, port: int, process: subprocess.Popen):
+        self.url = f"http://127.0.0.1:{port}/api/chat"
+        self.stats_url = f"http://127.0.0.1:{port}/stats"
+        self.process = process
+
+    def stats(self) -> dict:
+        with urllib.request.urlopen(self.stats_url, timeout=5) as response:
+            return json.load(response)
+
+
+@pytest.fixture
+def fake_llm():
+    """
+    Starts bench/fake_llm.py with the given options; fake_llm(latency=0.1).
+    """
+    started = []
+
+    def start(**options) -> FakeLLM:
+        port = _free_port()
+        args = [sys.executable, os.path.join(ROOT, "bench", "fake_llm.py"), "--port", str(port)]
+        for name, value in options.items():
+            args += [f"--{name.replace('_', '-')}", str(value)]
+
+        process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        fake = FakeLLM(port, process)
+        started.append(fake)
+
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                fake.stats()
+                return fake
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    yield start
+
+    for fake in started:
+        fake.process.terminate()
+        fake.process.wait(timeout=5)
+
+
+@pytest.fixture(autouse=True)
+def fresh_resilience(monkeypatch):
+    # Module-level breaker, budget and latency state, reset per test
+    monkeypatch.setattr(resilience, "LATENCY", resilience.LatencyTracker())
+    monkeypatch.setattr(resilience, "FIRST_QUESTION_LATENCY", resilience.LatencyTracker())
+    monkeypatch.setattr(resilience, "BUDGET", resilience.RetryBudget())
+    monkeypatch.setattr(resilience, "BREAKER", resilience.CircuitBreaker())
+    monkeypatch.setattr(resilience, "RESILIENCE_STATS", {key: 0 for key in resilience.RESILIENCE_STATS})
+    monkeypatch.setattr(resilience, "LLM_RETRY_BACKOFF_BASE", 0.01)
+
+
+def run(coro):
+    """
+    Runs a test coroutine; the shared LLM client belongs to its loop.
+    """
+    async def main():
+        try:
+            return await coro
+        finally:
+            await agent.close_client()
+
+    return asyncio.run(main())
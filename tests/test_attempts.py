@@ -0,0 +1,37 @@
+import pytest
+
+from schemas import parse_attempt
+
+FULL = {
+    "question": "Which layer routes packets?",
+    "options": ["Physical", "Network", "Session", "Transport"],
+    "selected_option": 1,
+    "correct_option": 1,
+    "subject": "Computer Networks",
+    "result": "Correct"
+}
+
+
+def test_reference_attempt():
+    assert parse_attempt({"question_id": "ab12", "selected_option": 3, "session": "s1"}) == {
+        "question_id": "ab12", "selected_option": 3, "session": "s1"
+    }
+
+
+def test_full_attempt_keeps_extra_fields():
+    assert parse_attempt(dict(FULL)) == FULL
+
+
+@pytest.mark.parametrize("entry", [
+    {"question": "x"},
+    {**FULL, "correct_option": None},
+    {**FULL, "correct_option": 4},
+    {**FULL, "selected_option": -1},
+    {**FULL, "options": ["a", "b"]},
+    {"question_id": "ab12", "selected_option": 4},
+    {"question_id": " ", "selected_option": 0},
+    {"selected_option": 0},
+])
+def test_malformed_attempts_rejected(entry):
+    with pytest.raises(ValueError):
+        parse_attempt(entry)
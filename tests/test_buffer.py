@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+import buffer
+import buffer_backends
+from conftest import run
+
+
+def _generator(batches: list):
+    calls = []
+
+    async def generate(subject):
+        calls.append(subject)
+        return batches[len(calls) - 1] if len(calls) <= len(batches) else []
+
+    return generate, calls
+
+
+@pytest.fixture(autouse=True)
+def no_store(monkeypatch):
+    pushed = []
+
+    # Buffered, but not written to the attempt store
+    async def push(subject, question):
+        pushed.append(question)
+        await buffer.BACKEND.push(subject, question)
+
+    monkeypatch.setattr(buffer, "_push", push)
+    monkeypatch.setattr(buffer, "EMPTY_BATCH_RETRIES", 2)
+    monkeypatch.setattr(buffer, "_warm_slots", None)
+    monkeypatch.setattr(buffer, "BACKEND", buffer_backends.MemoryBackend())
+    return pushed
+
+
+def test_all_duplicate_batch_is_regenerated(no_store):
+    generate, calls = _generator([[], [{"question": "fresh"}]])
+
+    assert run(buffer._generate_batch("DBMS", generate)) == 1
+    assert len(calls) == 2
+    assert no_store == [{"question": "fresh"}]
+
+
+def test_empty_batches_give_up_after_retries():
+    generate, calls = _generator([])
+
+    with pytest.raises(buffer.NoQuestionsGenerated):
+        run(buffer._generate_batch("DBMS", generate))
+    assert len(calls) == 3
+
+
+def test_overlapping_warm_ups_share_one_limit(monkeypatch):
+    monkeypatch.setattr(buffer, "WARM_CONCURRENCY", 2)
+    running = []
+    peak = []
+
+    async def generate(subject):
+        running.append(subject)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(subject)
+        return [{"question": subject}]
+
+    async def both():
+        # Startup warm-up and mock-test pool warming at the same time
+        await asyncio.gather(
+            buffer.warm({"DBMS": None, "Algorithms": None, "Compiler Design": None}, generate),
+            buffer.warm({"Digital Logic": 1, "Operating Systems": 1, "Computer Networks": 1}, generate)
+        )
+
+    run(both())
+    assert len(peak) >= 6
+    assert max(peak) == 2
+
+
+def test_empty_poll_records_no_serve(monkeypatch):
+    import prefetch
+
+    subject = "Digital Logic"
+    monkeypatch.setattr(prefetch, "DEMAND", {})
+
+    async def generate(subject):
+        return [{"question": "only one"}]
+
+    async def scenario():
+        for _ in range(5):
+            assert await buffer.get_question(subject, generate, wait=False) is None
+        served_before = prefetch.DEMAND[subject].served if subject in prefetch.DEMAND else 0
+        await buffer.BACKEND.push(subject, {"question": "ready"})
+        question = await buffer.get_question(subject, generate, wait=False)
+        return served_before, question
+
+    served_before, question = run(scenario())
+    assert served_before == 0
+    assert question == {"question": "ready"}
+    assert prefetch.DEMAND[subject].served == 1
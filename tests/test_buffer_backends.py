@@ -0,0 +1,116 @@
+import threading
+import uuid
+
+import pytest
+
+import buffer_backends
+import question_pool
+from conftest import run
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool(tmp_path, monkeypatch):
+    question_pool.close()
+    monkeypatch.setattr(question_pool, "POOL_DB_FILE", str(tmp_path / "question_pool.db"))
+    monkeypatch.setattr(question_pool, "QUESTION_POOL", True)
+    yield
+    question_pool.close()
+
+
+def _in_threads(*targets):
+    # Each thread gets its own pool connection, like separate workers
+    results = [None] * len(targets)
+
+    def call(i, target):
+        results[i] = target()
+
+    threads = [threading.Thread(target=call, args=(i, t)) for i, t in enumerate(targets)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_sqlite_claims_are_exclusive_across_connections():
+    for i in range(200):
+        question_pool.add("DBMS", {"question": f"q{i}"})
+
+    def drain():
+        claimed = []
+        while (question := question_pool.claim_next("DBMS")) is not None:
+            claimed.append(question["question"])
+        return claimed
+
+    first, second = _in_threads(drain, drain)
+
+    assert not set(first) & set(second)
+    assert len(first) + len(second) == 200
+
+
+def test_sqlite_lease_has_one_owner_across_connections():
+    a, b = _in_threads(
+        lambda: question_pool.acquire_lease("DBMS", "worker-a", 60),
+        lambda: question_pool.acquire_lease("DBMS", "worker-b", 60)
+    )
+    assert a != b
+
+    owner, other = ("worker-a", "worker-b") if a else ("worker-b", "worker-a")
+    assert _in_threads(lambda: question_pool.acquire_lease("DBMS", owner, 60)) == [True]
+    question_pool.release_lease("DBMS", owner)
+    assert _in_threads(lambda: question_pool.acquire_lease("DBMS", other, 60)) == [True]
+
+
+def test_expired_lease_can_be_taken_over():
+    assert question_pool.acquire_lease("DBMS", "worker-a", -1)
+    assert question_pool.acquire_lease("DBMS", "worker-b", 60)
+
+
+def test_sqlite_backend_round_trip():
+    backend = buffer_backends.SqliteBackend()
+
+    async def scenario():
+        assert await backend.acquire_refill("DBMS")
+        await backend.push("DBMS", {"question": "q1"})
+        await backend.push("DBMS", {"question": "q2"})
+        depth = await backend.depth("DBMS")
+        popped = [await backend.pop("DBMS") for _ in range(3)]
+        await backend.release_refill("DBMS")
+        return depth, popped
+
+    depth, popped = run(scenario())
+    assert depth == 2
+    assert popped == [{"question": "q1"}, {"question": "q2"}, None]
+
+
+def test_redis_backend_round_trip(monkeypatch):
+    pytest.importorskip("redis")
+    backend = buffer_backends.RedisBackend(buffer_backends.REDIS_URL)
+    subject = f"test-{uuid.uuid4().hex[:8]}"
+
+    async def scenario():
+        try:
+            await backend._redis.ping()
+        except Exception:
+            pytest.skip(f"no Redis server at {buffer_backends.REDIS_URL}")
+
+        try:
+            monkeypatch.setattr(buffer_backends, "WORKER_ID", "worker-a")
+            assert await backend.acquire_refill(subject)
+            monkeypatch.setattr(buffer_backends, "WORKER_ID", "worker-b")
+            assert not await backend.acquire_refill(subject)
+            # Only the owner can release
+            await backend.release_refill(subject)
+            assert not await backend.acquire_refill(subject)
+
+            await backend.push(subject, {"question": "q1"})
+            depth = await backend.depth(subject)
+            popped = [await backend.pop(subject), await backend.pop(subject)]
+            return depth, popped
+        finally:
+            await backend._redis.delete(backend._key(subject), backend._lease_key(subject))
+            await backend._redis.aclose()
+
+    depth, popped = run(scenario())
+    assert depth == 1
+    assert popped == [{"question": "q1"}, None]
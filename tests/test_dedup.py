@@ -0,0 +1,33 @@
+import dedup
+
+QUESTION = "Which data structure gives O(1) average lookup by key in a symbol table?"
+
+
+def test_same_question_is_indexed_once():
+    index = dedup.DedupIndex()
+    for _ in range(50):
+        index.add("q1", dedup.signature(QUESTION))
+
+    assert len(index) == 1
+
+
+def test_oldest_questions_are_evicted_past_the_cap():
+    index = dedup.DedupIndex(max_size=2)
+    texts = [f"{QUESTION} variant {word}" for word in ("alpha", "beta", "gamma")]
+    for i, text in enumerate(texts):
+        index.add(f"q{i}", dedup.signature(text + " " + "filler " * i * 5))
+
+    assert len(index) == 2
+    assert "q0" not in index and "q2" in index
+    # Evicted entries leave nothing behind in the band buckets
+    index.add("q3", dedup.signature("Unrelated question about TCP congestion control windows"))
+    index.add("q4", dedup.signature("Another unrelated question on page replacement policies"))
+    assert index.best_match(dedup.signature(texts[0])) == 0.0
+
+
+def test_near_duplicate_is_dropped(monkeypatch):
+    monkeypatch.setattr(dedup, "INDEX", dedup.DedupIndex())
+    monkeypatch.setattr(dedup, "DEDUP_STATS", {})
+
+    assert not dedup.is_duplicate("DBMS", {"question": QUESTION, "options": ["a", "b", "c", "d"]})
+    assert dedup.is_duplicate("DBMS", {"question": QUESTION + "?", "options": ["w", "x", "y", "z"]})
@@ -0,0 +1,164 @@
+import time
+
+import httpx
+import pytest
+
+import agent
+import resilience
+from conftest import run
+
+
+async def _first_question(stream):
+    try:
+        async for question in stream:
+            return question
+    finally:
+        await stream.aclose()
+
+
+async def _collect(stream) -> list:
+    return [question async for question in stream]
+
+
+@pytest.fixture
+def fast_hedge(monkeypatch):
+    monkeypatch.setattr(resilience, "LLM_HEDGE", True)
+    monkeypatch.setattr(resilience, "LLM_HEDGE_MIN_DELAY", 0.0)
+    monkeypatch.setattr(resilience, "LLM_HEDGE_DEFAULT_DELAY", 0.5)
+
+
+def test_hedge_wins_over_slow_call(fake_llm, fast_hedge, monkeypatch):
+    fake = fake_llm(latency=0.2, slow_first=1, slow_latency=10)
+    monkeypatch.setattr(agent, "OLLAMA_API_URL", fake.url)
+
+    started = time.monotonic()
+    questions = run(resilience.resilient(agent.generate_mcqs)("DBMS"))
+
+    assert questions
+    assert time.monotonic() - started < 5
+    assert resilience.RESILIENCE_STATS["hedges"] == 1
+    assert resilience.RESILIENCE_STATS["hedge_wins"] == 1
+
+
+def test_stream_hedge_wins_before_first_question(fake_llm, fast_hedge, monkeypatch):
+    fake = fake_llm(latency=0.2, slow_first=1, slow_latency=10)
+    monkeypatch.setattr(agent, "OLLAMA_API_URL", fake.url)
+
+    started = time.monotonic()
+    question = run(_first_question(resilience.resilient_stream(agent.generate_mcqs_stream)("DBMS")))
+
+    assert question["subject"] == "DBMS"
+    assert time.monotonic() - started < 5
+    assert resilience.RESILIENCE_STATS["hedges"] == 1
+    assert resilience.RESILIENCE_STATS["hedge_wins"] == 1
+
+
+def test_no_hedge_when_first_call_is_fast(fake_llm, fast_hedge, monkeypatch):
+    fake = fake_llm(latency=0.1)
+    monkeypatch.setattr(agent, "OLLAMA_API_URL", fake.url)
+
+    run(_first_question(resilience.resilient_stream(agent.generate_mcqs_stream)("DBMS")))
+
+    assert resilience.RESILIENCE_STATS["hedges"] == 0
+    assert fake.stats()["calls"] == 1
+
+
+def test_stream_total_timeout_fires_through_wrapper(fake_llm, monkeypatch):
+    fake = fake_llm(latency=4)
+    monkeypatch.setattr(agent, "OLLAMA_API_URL", fake.url)
+    monkeypatch.setattr(agent, "LLM_TOTAL_TIMEOUT", 1.0)
+    monkeypatch.setattr(resilience, "LLM_HEDGE", False)
+    monkeypatch.setattr(resilience, "LLM_RETRIES", 0)
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        run(_collect(resilience.resilient_stream(agent.generate_mcqs_stream)("DBMS")))
+
+    assert time.monotonic() - started < 2.5
+
+
+def test_retry_budget_exhaustion_stops_retries(fake_llm, monkeypatch):
+    fake = fake_llm(latency=0.05, error_rate=1.0)
+    monkeypatch.setattr(agent, "OLLAMA_API_URL", fake.url)
+    monkeypatch.setattr(resilience, "LLM_RETRIES", 5)
+    monkeypatch.setattr(resilience, "LLM_BREAKER_THRESHOLD", 100)
+    # One retry token left (the call itself deposits a fraction)
+    resilience.BUDGET.tokens = 1.0 - resilience.LLM_RETRY_BUDGET_RATIO
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run(resilience.resilient(agent.generate_mcqs)("DBMS"))
+
+    assert resilience.RESILIENCE_STATS["retries"] == 1
+    assert resilience.RESILIENCE_STATS["retries_denied"] == 1
+    assert fake.stats()["calls"] == 2
+
+
+def test_breaker_opens_probes_and_closes(fake_llm, monkeypatch):
+    failing = fake_llm(latency=0.05, error_rate=1.0)
+    healthy = fake_llm(latency=0.05)
+    monkeypatch.setattr(resilience, "LLM_RETRIES", 0)
+    monkeypatch.setattr(resilience, "LLM_BREAKER_THRESHOLD", 2)
+    monkeypatch.setattr(resilience, "LLM_BREAKER_COOLDOWN", 0.3)
+    generate = resilience.resilient(agent.generate_mcqs)
+
+    monkeypatch.setattr(agent, "OLLAMA_API_URL", failing.url)
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            run(generate("DBMS"))
+    assert resilience.BREAKER.state == "open"
+
+    # Open: fails fast without reaching the LLM
+    with pytest.raises(resilience.CircuitOpen):
+        run(generate("DBMS"))
+    assert failing.stats()["calls"] == 2
+
+    # After the cooldown one probe goes through and closes the circuit
+    time.sleep(0.35)
+    monkeypatch.setattr(agent, "OLLAMA_API_URL", healthy.url)
+    assert run(generate("DBMS"))
+    assert resilience.BREAKER.state == "closed"
+    assert healthy.stats()["calls"] == 1
+
+
+def test_failed_probe_reopens_breaker(fake_llm, monkeypatch):
+    failing = fake_llm(latency=0.05, error_rate=1.0)
+    monkeypatch.setattr(agent, "OLLAMA_API_URL", failing.url)
+    monkeypatch.setattr(resilience, "LLM_RETRIES", 0)
+    monkeypatch.setattr(resilience, "LLM_BREAKER_COOLDOWN", 0.0)
+    resilience.BREAKER.state = "open"
+
+    with pytest.raises(httpx.HTTPStatusError):
+        run(resilience.resilient(agent.generate_mcqs)("DBMS"))
+
+    assert resilience.BREAKER.state == "open"
+    assert not resilience.BREAKER._probing
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_unexpected_probe_error_does_not_wedge_breaker(fake_llm, monkeypatch, streaming):
+    healthy = fake_llm(latency=0.05)
+    monkeypatch.setattr(agent, "OLLAMA_API_URL", healthy.url)
+    monkeypatch.setattr(resilience, "LLM_BREAKER_COOLDOWN", 0.0)
+    resilience.BREAKER.state = "open"
+
+    async def broken(subject):
+        raise KeyError("message")
+
+    async def broken_stream(subject):
+        raise KeyError("message")
+        yield
+
+    # The half-open probe fails with an error outside FAILURES
+    with pytest.raises(KeyError):
+        if streaming:
+            run(_first_question(resilience.resilient_stream(broken_stream)("DBMS")))
+        else:
+            run(resilience.resilient(broken)("DBMS"))
+    assert not resilience.BREAKER._probing
+
+    # The next probe is still allowed and closes the circuit
+    if streaming:
+        assert run(_collect(resilience.resilient_stream(agent.generate_mcqs_stream)("DBMS")))
+    else:
+        assert run(resilience.resilient(agent.generate_mcqs)("DBMS"))
+    assert resilience.BREAKER.state == "closed"
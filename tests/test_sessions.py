@@ -0,0 +1,47 @@
+import pytest
+
+import sessions
+from conftest import run
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(sessions, "SHARED_POOL", {})
+    monkeypatch.setattr(sessions, "POOL_BASE", {})
+    monkeypatch.setattr(sessions, "SESSIONS", {})
+    monkeypatch.setattr(sessions, "SHARED_POOL_MAX", 4)
+
+
+def _fresh():
+    count = 0
+
+    async def get_fresh(subject):
+        nonlocal count
+        count += 1
+        return {"question": f"q{count}"}
+
+    return get_fresh
+
+
+def test_bitset_stays_bounded_as_pool_is_trimmed():
+    get_fresh = _fresh()
+    for _ in range(100):
+        run(sessions.next_question("a", "DBMS", get_fresh))
+
+    session = sessions.SESSIONS["a"]
+    assert sessions.POOL_BASE["DBMS"] == 96
+    assert session.seen["DBMS"].bit_length() <= sessions.SHARED_POOL_MAX
+
+
+def test_seen_questions_survive_a_trim():
+    get_fresh = _fresh()
+    for _ in range(3):
+        run(sessions.next_question("a", "DBMS", get_fresh))
+    # Another session grows the pool past the cap, trimming q1 and q2
+    for _ in range(6):
+        run(sessions.next_question("b", "DBMS", get_fresh))
+
+    served = [run(sessions.next_question("a", "DBMS", get_fresh))["question"] for _ in range(3)]
+
+    # q3 was already seen by "a"; q4..q6 are still in the pool
+    assert served == ["q4", "q5", "q6"]
@@ -0,0 +1,62 @@
+import json
+import threading
+
+import pytest
+
+import storage
+
+
+@pytest.fixture
+def legacy_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "DB_FILE", str(tmp_path / "bel_pe.db"))
+    monkeypatch.setattr(storage, "DATA_FILE", str(tmp_path / "bel_pe_questions.json"))
+
+    def write(payload):
+        with open(storage.DATA_FILE, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+
+    conn = storage.connect()
+    storage._init_db(conn)
+    conn.close()
+    return write
+
+
+def _attempt_count() -> int:
+    conn = storage.connect()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM attempts").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_concurrent_migrations_import_once(legacy_store):
+    legacy_store([{"subject": "DBMS", "result": "Correct"} for _ in range(50)])
+    errors = []
+
+    def migrate():
+        conn = storage.connect()
+        try:
+            storage._migrate_json_file(conn)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=migrate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert _attempt_count() == 50
+
+
+def test_non_list_payload_is_skipped(legacy_store):
+    legacy_store({"subject": "DBMS"})
+
+    conn = storage.connect()
+    storage._migrate_json_file(conn)
+    conn.close()
+
+    assert _attempt_count() == 0